@@ -78,25 +78,62 @@ def etl_generali_oop():
                 local_dir=i["local_path"],
                 input_pattern=i["inputFileName"],
                 output_basename=i["outputFileName"],
+                csv_options=i.get("csv_options"),  # opcional: {"sep": ";", "encoding": ..., "dtypes": {...}}
             )
             for i in items
         ]
 
     @task
     def adapt_bq_kwargs(items: list[dict]) -> list[dict]:
-        """Adapta los dicts de PCBQ al kwargs requerido por BigQueryLoadOperator."""
-        out: list[dict] = []
+        """
+        Adapta los dicts de PCBQ al kwargs requerido por BigQueryLoadOperator.
+        Los bloques con la misma tabla destino y acción se agrupan en UN load job
+        (lista de URIs); source_objects puede ser un objeto, una lista o un comodín.
+        Un bloque con `local_path` (Parquet del merge) carga directo desde disco, sin
+        pasar por raw/ en GCS; `backup_uri` opcional sube la copia en paralelo.
+        """
+        grouped: dict[tuple, dict] = {}
+        local: list[dict] = []
         for i in items:
-            out.append(
-                dict(
+            if i.get("local_path"):
+                local.append(dict(
                     credentials="/opt/airflow/gcp/dbt_test.json",
                     project=i["project_id"],
                     table_id=f"{i['project_id']}.{i['dataset_name']}.{i['table_name']}",
-                    action=i["truncate_drop_into"],  # TRUNCATE | DROP | INSERT_INTO
-                    gcs_uri=f"gs://{i['bucket_name']}/{i['source_objects']}",
-                )
-            )
-        return out
+                    action=i["truncate_drop_into"],
+                    local_path=i["local_path"],
+                    backup_uri=i.get("backup_uri"),
+                ))
+                continue
+            objects = i["source_objects"]
+            objects = objects if isinstance(objects, list) else [objects]
+            table_id = f"{i['project_id']}.{i['dataset_name']}.{i['table_name']}"
+            action = i["truncate_drop_into"]  # TRUNCATE | DROP | INSERT_INTO
+            entry = grouped.setdefault((table_id, str(action).upper()), dict(
+                credentials="/opt/airflow/gcp/dbt_test.json",
+                project=i["project_id"],
+                table_id=table_id,
+                action=action,
+                gcs_uri=[],
+            ))
+            for o in objects:
+                uri = f"gs://{i['bucket_name']}/{o}"
+                if uri not in entry["gcs_uri"]:
+                    entry["gcs_uri"].append(uri)
+        out = list(grouped.values())
+        for entry in out:
+            if len(entry["gcs_uri"]) == 1:
+                entry["gcs_uri"] = entry["gcs_uri"][0]
+        return out + local
+
+    @task(trigger_rule="all_success")
+    def commit_dedup(items: list[dict] | dict, run_id: str | None = None) -> int:
+        """
+        Confirma los uniqueid emitidos por el merge (PM1) recién cuando la carga a
+        BigQuery terminó bien; si falló, la próxima corrida los vuelve a emitir.
+        """
+        items = items if isinstance(items, list) else [items]
+        return sum(MergeProcessOperator.commit_dedup(cfg, run_id) for cfg in items)
 
     # --------------
     # DBT prep en UNA sola función
@@ -226,10 +263,12 @@ def etl_generali_oop():
                     "DROP TABLE IF EXISTS `memorialtechnologies-245614.generali.call_cleaning`",
                 ]
             ),
+            mode="parallel",   # DROPs independientes: los 3 jobs a la vez
         )
 
         empty_local = EmptyFolderOperator(
-            task_id="empty_local", path="/opt/airflow/data/Extracted_generali"
+            task_id="empty_local", path="/opt/airflow/data/Extracted_generali",
+            mode="fast",   # rename a papelera + purga en segundo plano
         )
 
         clear_gcs >> drop_tables >> empty_local
@@ -283,6 +322,7 @@ def etl_generali_oop():
         pcbq = by_prefix(params, "PCBQ")
         bq_kwargs = adapt_bq_kwargs(pcbq)
         bq_load = BigQueryLoadOperator.partial(task_id="bq_load").expand_kwargs(bq_kwargs)
+        bq_load >> commit_dedup(pm1)
 
     # --------------
     # DBT (prep en una sola función)
@@ -1,11 +1,17 @@
 from __future__ import annotations
+import os
 from typing import Optional, Literal
 from airflow.models import BaseOperator
 from airflow.utils.context import Context
-from utils.bq_service import BigQueryService
+from utils.bq_service import BigQueryService, LOAD_SCHEMA_CACHE
+from utils.custom_logger import CustomLogger
+from utils.gcp_clients import storage_client
+from utils.load_ledger import LOAD_LEDGER_PATH, LoadLedger, source_fingerprint
+from utils.load_schema import uri_list
+from triggers.bigquery_job_trigger import BigQueryJobTrigger
 
 class BigQueryLoadOperator(BaseOperator):
-    template_fields = ("credentials","project","table_id","action","gcs_uri","source_format")
+    template_fields = ("credentials","project","table_id","action","gcs_uri","local_path","backup_uri","source_format")
     def __init__(
         self,
         *,
@@ -13,23 +19,152 @@ class BigQueryLoadOperator(BaseOperator):
         project: str | None,
         table_id: str,
         action: str,
-        gcs_uri: str,
+        gcs_uri: str | list[str] | None = None,   # uno, varios o comodín (gs://b/backup/X_2025-*.parquet): un solo load job
+        local_path: str | None = None,      # alternativa a gcs_uri: Parquet/CSV local directo al load job (sin raw/ en GCS)
+        backup_uri: str | None = None,      # con local_path: copia a GCS en paralelo con la carga
         source_format: Literal["PARQUET","CSV"] = "PARQUET",  # NEW default
         write_disposition: Optional[str] = None,
+        single_job_truncate: bool = True,   # TRUNCATE => un solo load job con WRITE_TRUNCATE
+        load_mode: str = "direct",          # "direct" | "staging" (carga a staging, valida y swap atómico)
+        swap_method: str = "copy",          # staging: "copy" (atómico) | "rename" (DDL)
+        staging_suffix: str = "__staging",
+        min_rows: int = 1,
+        min_row_ratio: Optional[float] = None,   # staging: filas >= ratio * filas actuales
+        schema: dict | list | None = None,  # contrato declarado {col: tipo}; si no, el cacheado por table_id
+        schema_check: bool = True,          # valida el archivo contra el schema antes de tocar la tabla
+        on_schema_drift: str = "fail",      # "fail" | "update" (sólo Parquet)
+        schema_cache_path: Optional[str] = None,
+        time_partitioning: str | dict | None = None,   # "fecha_carga" | {"field","type","expiration_days"} | "INGESTION"
+        clustering_fields: list[str] | None = None,    # p.ej. ["uniqueid", "call_source"]
+        deferrable: bool = False,           # libera el worker: el polling del job lo hace el triggerer
+        poll_interval: float = 10.0,
+        skip_unchanged: bool = True,        # misma fuente (generation + md5) y misma cantidad de filas => no recarga
+        ledger_path: Optional[str] = None,
         **kwargs
     ):
         super().__init__(**kwargs)
         self.credentials = credentials; self.project = project
         self.table_id = table_id; self.action = action; self.gcs_uri = gcs_uri
+        self.local_path = local_path; self.backup_uri = backup_uri
         self.source_format = source_format
         self.write_disposition = write_disposition
+        self.single_job_truncate = single_job_truncate
+        self.load_mode = load_mode; self.swap_method = swap_method; self.staging_suffix = staging_suffix
+        self.min_rows = min_rows; self.min_row_ratio = min_row_ratio
+        self.schema = schema; self.schema_check = schema_check; self.on_schema_drift = on_schema_drift
+        self.schema_cache_path = schema_cache_path or LOAD_SCHEMA_CACHE
+        self.time_partitioning = time_partitioning; self.clustering_fields = clustering_fields
+        self.deferrable = deferrable; self.poll_interval = poll_interval
+        self.skip_unchanged = skip_unchanged; self.ledger_path = ledger_path or LOAD_LEDGER_PATH
+
+    def _settings(self) -> dict:
+        """Parámetros que cambian el resultado de la carga: si cambian, se recarga aunque la fuente sea la misma."""
+        return {
+            "action": (self.action or "").upper(), "source_format": self.source_format,
+            "write_disposition": self.write_disposition, "schema": self.schema,
+            "time_partitioning": self.time_partitioning, "clustering_fields": self.clustering_fields,
+        }
+
+    def _record_load(self, bq: BigQueryService, sources: list | None, settings: dict) -> None:
+        """Registra la carga exitosa en el ledger (filas actuales de la tabla destino)."""
+        if not sources:
+            return
+        job_id = bq.job_stats[-1]["job_id"] if bq.job_stats else None
+        with LoadLedger(self.ledger_path) as ledger:
+            ledger.record(self.table_id, sources, bq.row_count(self.table_id), settings, job_id)
 
     def execute(self, context: Context):
+        if bool(self.gcs_uri) == bool(self.local_path):
+            raise ValueError("Pass exactly one of gcs_uri or local_path")
+        if self.local_path and not os.path.isfile(self.local_path):
+            raise FileNotFoundError(self.local_path)
+        if self.backup_uri and not self.local_path:
+            raise ValueError("backup_uri only applies with local_path")
+        bq = BigQueryService(self.credentials, self.project)
+        schema = None
+        if self.schema_check or self.schema:
+            # antes de cualquier DROP/TRUNCATE: si el archivo cambió de forma, falla acá
+            schema = bq.resolve_load_schema(
+                self.gcs_uri, self.table_id, self.source_format, declared=self.schema,
+                cache_path=self.schema_cache_path, on_drift=self.on_schema_drift, local_path=self.local_path,
+            )
+        layout = dict(time_partitioning=self.time_partitioning, clustering_fields=self.clustering_fields)
+        if self.time_partitioning or self.clustering_fields:
+            # DROP recrea la tabla con el layout pedido, salvo el swap por copia (copia sobre la existente)
+            recreated = (self.action or "").upper() == "DROP" and not (
+                self.load_mode == "staging" and self.swap_method == "copy")
+            bq.ensure_table_layout(self.table_id, incoming=schema, check_existing=not recreated, **layout)
+        settings = self._settings()
+        sources = None
+        if self.skip_unchanged:
+            # rerun (p.ej. DAG run limpiado) con la misma fuente: no se vuelve a truncar ni cargar
+            sources = source_fingerprint(None if self.local_path else storage_client(self.credentials),
+                                         self.gcs_uri, self.local_path)
+            with LoadLedger(self.ledger_path) as ledger:
+                entry = ledger.unchanged(self.table_id, sources, bq.row_count(self.table_id), settings)
+            if entry:
+                CustomLogger.emit(5, "load_ledger", "PCBQ", self.table_id, "BIGQUERY", "False",
+                                  f"Fuente sin cambios desde {entry['loaded_at']} (job {entry['job_id']}): "
+                                  f"se omite la carga, {entry['rows']} filas")
+                with bq.backup_in_background(self.local_path, self.backup_uri):
+                    pass  # el backup pedido se sube igual (p.ej. backup_uri con otra fecha)
+                context["ti"].xcom_push(key="bq_job_stats", value=bq.job_stats)
+                return entry["rows"]
+        rows = None
+        remember_schema = self.schema_check and schema is None and self.source_format == "CSV"
+        # el backup sube en paralelo con la carga; se espera al salir del bloque (antes de diferir)
+        with bq.backup_in_background(self.local_path, self.backup_uri):
+            if self.load_mode == "staging":
+                if self.deferrable:
+                    self.log.info("load_mode='staging' encadena varios jobs: se ejecuta sin diferir")
+                rows = bq.load_via_staging(
+                    gcs_uri=self.gcs_uri, table_id=self.table_id, action=self.action,
+                    source_format=self.source_format, swap_method=self.swap_method,
+                    staging_suffix=self.staging_suffix, min_rows=self.min_rows, min_row_ratio=self.min_row_ratio,
+                    schema=schema, local_path=self.local_path, **layout,
+                )
+            elif self.load_mode != "direct":
+                raise ValueError("load_mode must be 'direct' or 'staging'")
+            elif (self.single_job_truncate and (self.action or "").upper() == "TRUNCATE"
+                    and self.write_disposition in (None, "WRITE_TRUNCATE")):
+                job = bq.truncate_and_load(gcs_uri=self.gcs_uri, table_id=self.table_id,
+                                           source_format=self.source_format, schema=schema, wait=not self.deferrable,
+                                           local_path=self.local_path, **layout)
+            else:
+                bq.manage_table(self.table_id, self.action)
+                load, source = bq.loader(self.gcs_uri, self.local_path, wait=not self.deferrable)
+                job = load(
+                    **source,
+                    table_id=self.table_id,
+                    source_format=self.source_format,
+                    write_disposition=self.write_disposition,
+                    schema=schema,
+                    **layout,
+                )
+        if self.deferrable and self.load_mode == "direct":
+            self.defer(
+                trigger=BigQueryJobTrigger(job.job_id, job.project, job.location, self.credentials, self.poll_interval),
+                method_name="execute_complete",
+                kwargs={"remember_schema": remember_schema, "sources": sources, "settings": settings},
+            )
+        if remember_schema:
+            # primera carga CSV sin contrato: se fija lo que infirió BigQuery
+            bq.remember_table_schema(self.table_id, self.schema_cache_path)
+        self._record_load(bq, sources, settings)
+        context["ti"].xcom_push(key="bq_job_stats", value=bq.job_stats)
+        return rows
+
+    def execute_complete(self, context: Context, event: dict, remember_schema: bool = False,
+                         sources: list | None = None, settings: dict | None = None):
+        """Vuelve del triggerer: valida el resultado del job y registra las filas."""
+        if event.get("status") != "success":
+            CustomLogger.emit(5, "load_gcs", "PCBQ", self.table_id, "BIGQUERY", "True", event.get("message"))
+            raise RuntimeError(f"BigQuery job {event.get('job_id')} failed: {event.get('message')}")
         bq = BigQueryService(self.credentials, self.project)
-        bq.manage_table(self.table_id, self.action)
-        bq.load_from_gcs(
-            gcs_uri=self.gcs_uri,
-            table_id=self.table_id,
-            source_format=self.source_format,
-            write_disposition=self.write_disposition,
-        )
+        job = bq.client.get_job(event["job_id"], location=event.get("location"))
+        rows = bq.log_load(self.table_id, len(uri_list(self.gcs_uri)) if self.gcs_uri else 1, job)
+        if remember_schema:
+            bq.remember_table_schema(self.table_id, self.schema_cache_path)
+        self._record_load(bq, sources, settings or {})
+        context["ti"].xcom_push(key="bq_job_stats", value=bq.job_stats)
+        return rows
@@ -1,19 +1,137 @@
-
 from __future__ import annotations
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 from airflow.models import BaseOperator
 from airflow.utils.context import Context
-from google.cloud import bigquery
-import os
+from utils.custom_logger import CustomLogger
+from utils.gcp_clients import bigquery_client
+from utils.sql_split import split_statements
+from utils.bq_telemetry import job_stats, summary
+from triggers.bigquery_job_trigger import BigQueryJobTrigger
+
+SQL_MODES = ("sequential", "script", "parallel")
 
 class BigQuerySQLOperator(BaseOperator):
+    """
+    Ejecuta `sql` (uno o varios statements separados por `;`).
+      - mode="sequential" (default): un job por statement, en orden.
+      - mode="script": TODO el SQL en un único job multi-statement de BigQuery
+        (un solo round trip; los tiempos por statement salen de los jobs hijos).
+      - mode="parallel": statements independientes (p.ej. varios DROP) en
+        paralelo, hasta `max_workers` jobs a la vez.
+    El split respeta literales, identificadores con backticks, comentarios y
+    bloques BEGIN…END. Devuelve (XCom) los tiempos por statement.
+    """
     template_fields = ("credentials","project","sql")
-    def __init__(self, *, credentials: str | None, project: str | None, sql: str, **kwargs):
+    def __init__(
+        self,
+        *,
+        credentials: str | None,
+        project: str | None,
+        sql: str,
+        mode: str = "sequential",
+        max_workers: int = 4,
+        deferrable: bool = False,     # sequential: cada statement se difiere | script: el job único
+        poll_interval: float = 10.0,
+        **kwargs
+    ):
         super().__init__(**kwargs)
         self.credentials = credentials; self.project = project; self.sql = sql
+        self.mode = mode; self.max_workers = max_workers
+        self.deferrable = deferrable; self.poll_interval = poll_interval
+
+    def _statements(self) -> list[str]:
+        return split_statements(self.sql)
+
+    # ----------------------- timings -----------------------
+
+    @staticmethod
+    def _timing(stmt: str, job, wall: float | None = None) -> dict:
+        """Stats del job (bytes, slots, cola, ejecución, cache, filas) + texto y duración del statement."""
+        stats = job_stats(job, " ".join(stmt.split())[:120])
+        seconds = stats["exec_s"] if stats["exec_s"] is not None else wall
+        return {
+            **stats,
+            "statement": stats["label"],
+            "seconds": round(seconds, 3) if seconds is not None else None,
+            "rows": stats["output_rows"],
+        }
+
+    def _report(self, timings: list[dict], total: float | None = None) -> list[dict]:
+        for i, t in enumerate(timings, 1):
+            self.log.info(f"[{i}/{len(timings)}] {t['seconds']} s - {t['statement']} | {summary(t)}")
+            CustomLogger.emit(5, "job_stats", "PCBQ", self.task_id, "BIGQUERY", "False",
+                              json.dumps({**t, "mode": self.mode, "index": i}, default=str))
+        if total is not None:
+            self.log.info(f"SQL ({self.mode}): {len(timings)} statements en {total:.2f} s")
+        return timings
+
+    def _script_timings(self, client, job) -> list[dict]:
+        """Jobs hijos del script (uno por statement ejecutado), en orden de ejecución."""
+        children = list(client.list_jobs(parent_job=job.job_id))
+        children.sort(key=lambda j: j.started or j.created)
+        return [self._timing(getattr(c, "query", "") or c.job_id, c) for c in children]
+
+    # ----------------------- execute -----------------------
+
     def execute(self, context: Context):
-        if self.credentials:
-            os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = self.credentials
-        client = bigquery.Client(project=self.project)
-        # Allow multiple statements separated by ';'
-        for stmt in [s.strip() for s in self.sql.split(';') if s.strip()]:
-            client.query(stmt).result()
+        if self.mode not in SQL_MODES:
+            raise ValueError(f"mode must be one of {SQL_MODES}")
+        client = bigquery_client(self.credentials, self.project)
+        statements = self._statements()
+        if not statements:
+            return []
+
+        if self.deferrable and self.mode == "parallel":
+            self.log.info("mode='parallel' mantiene varios jobs en vuelo: se ejecuta sin diferir")
+        elif self.deferrable:
+            self._submit(client, 0, [])
+            return
+
+        t0 = time.monotonic()
+        if self.mode == "script":
+            job = client.query(self.sql)
+            job.result()
+            return self._report(self._script_timings(client, job), time.monotonic() - t0)
+
+        def run(stmt):
+            s0 = time.monotonic()
+            job = client.query(stmt)
+            job.result()
+            return self._timing(stmt, job, time.monotonic() - s0)
+
+        if self.mode == "parallel" and len(statements) > 1:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(statements)),
+                                    thread_name_prefix="bq_sql") as pool:
+                timings = list(pool.map(run, statements))
+        else:
+            timings = [run(stmt) for stmt in statements]
+        return self._report(timings, time.monotonic() - t0)
+
+    # ----------------------- deferrable -----------------------
+
+    def _submit(self, client, index: int, timings: list[dict]) -> None:
+        sql = self.sql if self.mode == "script" else self._statements()[index]
+        job = client.query(sql)
+        self.defer(
+            trigger=BigQueryJobTrigger(job.job_id, job.project, job.location, self.credentials, self.poll_interval),
+            method_name="execute_complete",
+            kwargs={"index": index, "timings": timings},
+        )
+
+    def execute_complete(self, context: Context, event: dict, index: int = 0, timings: list | None = None):
+        """Vuelve del triggerer: registra el statement (o el script) y encadena el siguiente."""
+        statements = self._statements()
+        if event.get("status") != "success":
+            CustomLogger.emit(5, "run_sql", "PCBQ", self.task_id, "BIGQUERY", "True",
+                              f"Statement {index + 1}/{len(statements)}: {event.get('message')}")
+            raise RuntimeError(f"BigQuery job {event.get('job_id')} failed: {event.get('message')}")
+        client = bigquery_client(self.credentials, self.project)
+        job = client.get_job(event["job_id"], location=event.get("location"))
+        if self.mode == "script":
+            return self._report(self._script_timings(client, job))
+        timings = list(timings or []) + [self._timing(statements[index], job)]
+        if index + 1 < len(statements):
+            self._submit(client, index + 1, timings)
+        return self._report(timings)
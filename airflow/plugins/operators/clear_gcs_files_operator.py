@@ -1,21 +1,112 @@
-
 from __future__ import annotations
+import fnmatch
+from concurrent.futures import ThreadPoolExecutor
 from airflow.models import BaseOperator
 from airflow.utils.context import Context
 from google.cloud import storage
-import os
+from google.cloud.storage.batch import Batch
+from utils.gcp_clients import storage_client
+
+_BATCH_SIZE = 100   # límite de llamadas por request batch de la API de GCS
+_WILDCARDS = "*?["
+
+
+class _RecordingBatch(Batch):
+    """Batch que guarda lo que devuelve finish(): una respuesta por llamada diferida, en orden."""
+
+    responses = ()
+
+    def finish(self, raise_exception=True):
+        self.responses = super().finish(raise_exception=raise_exception)
+        return self.responses
+
 
 class ClearGCSFilesOperator(BaseOperator):
-    template_fields = ("credentials","bucket","folder","files")
-    def __init__(self, *, credentials: str | None, bucket: str, folder: str, files: list[str], **kwargs):
+    """
+    Borra objetos de `bucket` bajo `folder`.
+      - files: nombres exactos o globs (p.ej. "RAW_*.parquet"), relativos a `folder`.
+      - prefixes: borra todo lo que empiece con folder/<prefix> ("" = toda la carpeta).
+    Los borrados van en requests batch de hasta 100 objetos (sin exists() previo);
+    mode="concurrent" envía varios batches en paralelo para carpetas grandes.
+    Un 404 cuenta como ya borrado; cualquier otro error falla la tarea (RuntimeError).
+    Devuelve (XCom) la cantidad de objetos borrados.
+    """
+    template_fields = ("credentials","bucket","folder","files","prefixes")
+    def __init__(
+        self,
+        *,
+        credentials: str | None,
+        bucket: str,
+        folder: str,
+        files: list[str] | None = None,
+        prefixes: list[str] | None = None,
+        mode: str = "batch",        # "batch" = batches en serie | "concurrent" = batches en paralelo
+        max_workers: int = 8,
+        **kwargs
+    ):
         super().__init__(**kwargs)
-        self.credentials = credentials; self.bucket = bucket; self.folder = folder; self.files = files
-    def execute(self, context: Context):
-        if self.credentials:
-            os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = self.credentials
-        client = storage.Client(); b = client.bucket(self.bucket)
+        self.credentials = credentials; self.bucket = bucket; self.folder = folder; self.files = files or []
+        self.prefixes = prefixes or []
+        self.mode = mode; self.max_workers = max_workers
+
+    def _path(self, name: str) -> str:
+        folder = (self.folder or "").strip("/")
+        return f"{folder}/{name}" if folder else name
+
+    def _select(self, client: storage.Client) -> list[str]:
+        names: dict[str, None] = {}   # dict = set ordenado
         for f in self.files:
-            p = f"{self.folder}/{f}"
-            blob = b.blob(p)
-            if blob.exists(): blob.delete(); self.log.info(f"Deleted: {p}")
-            else: self.log.info(f"Not found: {p}")
+            p = self._path(f)
+            if any(c in p for c in _WILDCARDS):
+                literal = p[:min(p.index(c) for c in _WILDCARDS if c in p)]
+                for blob in client.list_blobs(self.bucket, prefix=literal, fields="items(name),nextPageToken"):
+                    if fnmatch.fnmatchcase(blob.name, p):
+                        names[blob.name] = None
+            else:
+                names[p] = None
+        for prefix in self.prefixes:
+            for blob in client.list_blobs(self.bucket, prefix=self._path(prefix),
+                                          fields="items(name),nextPageToken"):
+                names[blob.name] = None
+        return list(names)
+
+    def _delete_batch(self, client: storage.Client, names: list[str]) -> tuple[int, int]:
+        """Un request batch; devuelve (borrados, no encontrados). Otro status es un error."""
+        bucket = client.bucket(self.bucket)
+        with _RecordingBatch(client, raise_exception=False) as batch:
+            for name in names:
+                bucket.blob(name).delete()
+        deleted = missing = 0
+        failed = []
+        for name, response in zip(names, batch.responses):
+            if 200 <= response.status_code < 300:
+                deleted += 1
+            elif response.status_code == 404:
+                missing += 1
+            else:
+                failed.append(f"{name} ({response.status_code})")
+        if failed:
+            raise RuntimeError(f"No se pudieron borrar {len(failed)} objetos de gs://{self.bucket}: "
+                               + ", ".join(failed[:10]))
+        return deleted, missing
+
+    def execute(self, context: Context):
+        client = storage_client(self.credentials)
+        names = self._select(client)
+        chunks = [names[i:i + _BATCH_SIZE] for i in range(0, len(names), _BATCH_SIZE)]
+        if self.mode == "concurrent" and len(chunks) > 1:
+            # El batch activo se apila por hilo en el cliente (thread-local), así que
+            # cada hilo usa el cliente del registro (mismas credenciales y pool HTTP).
+            def run(chunk):
+                return self._delete_batch(storage_client(self.credentials), chunk)
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="gcs_delete") as pool:
+                results = list(pool.map(run, chunks))
+        elif self.mode in ("batch", "concurrent"):
+            results = [self._delete_batch(client, chunk) for chunk in chunks]
+        else:
+            raise ValueError("mode must be 'batch' or 'concurrent'")
+        deleted = sum(d for d, _ in results)
+        missing = sum(m for _, m in results)
+        self.log.info(f"Deleted: {deleted} de {len(names)} objetos en gs://{self.bucket}/{self.folder} "
+                      f"(no encontrados: {missing})")
+        return deleted
@@ -1,18 +1,50 @@
-
 from __future__ import annotations
-import os, shutil
+import errno, os, shutil, subprocess, time, uuid
+from concurrent.futures import ThreadPoolExecutor
 from airflow.models import BaseOperator
 from airflow.utils.context import Context
 
 class EmptyFolderOperator(BaseOperator):
+    """
+    mode="sync" (default): borra entrada por entrada, como siempre.
+    mode="fast": mueve el contenido (rename, mismo filesystem) a una carpeta
+    papelera hermana `.<carpeta>_trash/` y deja la carpeta vacía al instante; el
+    borrado real queda fuera del camino crítico según `purge`:
+      - "background": proceso `rm -rf` desacoplado de la tarea (default)
+      - "parallel": scandir + pool de hilos dentro de la tarea
+      - "none": queda para la próxima corrida (que purga papeleras viejas)
+    Filtros opcionales (sólo archivos, a cualquier profundidad): older_than_hours
+    (mtime) y min_size_mb; con filtros se mueven sólo los archivos que califican.
+    Si una entrada no se puede mover a la papelera porque está en otro filesystem
+    (p.ej. la carpeta es un mount point: EXDEV/EBUSY), se borra en el momento como
+    en mode="sync". Si al final queda algo sin vaciar, la tarea falla.
+    """
     template_fields = ("path",)
-    def __init__(self, *, path: str, **kwargs):
+    def __init__(
+        self,
+        *,
+        path: str,
+        mode: str = "sync",
+        purge: str = "background",
+        older_than_hours: float | None = None,
+        min_size_mb: float | None = None,
+        purge_workers: int = 8,
+        **kwargs
+    ):
         super().__init__(**kwargs)
         self.path = path
+        self.mode = mode; self.purge = purge
+        self.older_than_hours = older_than_hours; self.min_size_mb = min_size_mb
+        self.purge_workers = purge_workers
+
     def execute(self, context: Context):
         p = self.path
         if not os.path.exists(p):
             self.log.info(f"Carpeta no existe: {p}"); return
+        if self.mode == "fast":
+            return self._fast(p)
+        if self.mode != "sync":
+            raise ValueError("mode must be 'sync' or 'fast'")
         for item in os.listdir(p):
             fp = os.path.join(p,item)
             try:
@@ -21,3 +53,121 @@ class EmptyFolderOperator(BaseOperator):
             except Exception as e:
                 self.log.warning(f"No se pudo eliminar {fp}: {e}")
         self.log.info(f"Carpeta vaciada: {p}")
+
+    # ----------------------- modo fast -----------------------
+
+    def _trash_root(self, p: str) -> str:
+        p = os.path.normpath(p)
+        return os.path.join(os.path.dirname(p), f".{os.path.basename(p)}_trash")
+
+    def _qualifies(self, entry: os.DirEntry, now: float) -> bool:
+        st = entry.stat(follow_symlinks=False)
+        if self.older_than_hours is not None and now - st.st_mtime < self.older_than_hours * 3600:
+            return False
+        if self.min_size_mb is not None and st.st_size < self.min_size_mb * 1024 * 1024:
+            return False
+        return True
+
+    @staticmethod
+    def _remove(fp: str) -> None:
+        if os.path.isdir(fp) and not os.path.islink(fp): shutil.rmtree(fp)
+        else: os.unlink(fp)
+
+    def _move_or_delete(self, src: str, target: str, counts: dict, failed: list) -> None:
+        """rename a la papelera; entre filesystems (EXDEV/EBUSY) se borra en el momento."""
+        try:
+            os.rename(src, target); counts["moved"] += 1
+        except OSError as e:
+            if e.errno not in (errno.EXDEV, errno.EBUSY):
+                self.log.warning(f"No se pudo mover {src}: {e}"); failed.append(src); return
+            try:
+                self._remove(src); counts["deleted"] += 1
+            except OSError as e2:
+                self.log.warning(f"No se pudo eliminar {src}: {e2}"); failed.append(src)
+
+    def _move_filtered(self, src: str, dst: str, now: float, counts: dict) -> list:
+        """Mueve a `dst` (misma estructura relativa) los archivos de `src` que pasan los filtros; devuelve los que fallaron."""
+        failed = []
+        stack = [""]
+        while stack:
+            rel = stack.pop()
+            with os.scandir(os.path.join(src, rel)) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(os.path.join(rel, entry.name)); continue
+                        if not self._qualifies(entry, now):
+                            continue
+                        target = os.path.join(dst, rel, entry.name)
+                        os.makedirs(os.path.dirname(target), exist_ok=True)
+                    except OSError as e:
+                        self.log.warning(f"No se pudo mover {entry.path}: {e}"); failed.append(entry.path); continue
+                    self._move_or_delete(entry.path, target, counts, failed)
+        return failed
+
+    def _move_all(self, src: str, dst: str, counts: dict) -> list:
+        """Rename de la carpeta completa y se recrea vacía; si no se puede (mount point), entrada por entrada."""
+        mode = os.stat(src).st_mode
+        try:
+            os.rename(src, dst)
+            os.makedirs(src, exist_ok=True); os.chmod(src, mode)
+            with os.scandir(dst) as it:
+                counts["moved"] += sum(1 for _ in it)
+            return []
+        except OSError:
+            os.makedirs(dst, exist_ok=True)
+            failed = []
+            with os.scandir(src) as it:
+                for entry in list(it):
+                    self._move_or_delete(entry.path, os.path.join(dst, entry.name), counts, failed)
+            return failed
+
+    def _purge_parallel(self, root: str) -> None:
+        """Borra el árbol con scandir: archivos en paralelo, después carpetas de abajo hacia arriba."""
+        files, dirs, stack = [], [], [root]
+        while stack:
+            d = stack.pop(); dirs.append(d)
+            with os.scandir(d) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False): stack.append(entry.path)
+                    else: files.append(entry.path)
+        def unlink(fp):
+            try: os.unlink(fp)
+            except OSError as e: self.log.warning(f"No se pudo eliminar {fp}: {e}")
+        with ThreadPoolExecutor(max_workers=self.purge_workers, thread_name_prefix="purge") as pool:
+            list(pool.map(unlink, files))
+        for d in reversed(dirs):
+            try: os.rmdir(d)
+            except OSError as e: self.log.warning(f"No se pudo eliminar {d}: {e}")
+
+    def _fast(self, p: str):
+        if self.purge not in ("background", "parallel", "none"):
+            raise ValueError("purge must be 'background', 'parallel' or 'none'")
+        trash_root = self._trash_root(p)
+        os.makedirs(trash_root, exist_ok=True)
+        batch = os.path.join(trash_root, f"{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}")
+
+        t0 = time.monotonic()
+        counts = {"moved": 0, "deleted": 0}
+        if self.older_than_hours is None and self.min_size_mb is None:
+            failed = self._move_all(p, batch, counts)
+            failed += [os.path.join(p, n) for n in os.listdir(p) if os.path.join(p, n) not in failed]
+        else:
+            failed = self._move_filtered(p, batch, time.time(), counts)
+        if failed:
+            # lo que quede se volvería a leer (y mergear) en la próxima corrida
+            raise RuntimeError(f"No se pudo vaciar {p}: quedan {len(failed)} entradas, p.ej. {failed[:5]}")
+        self.log.info(f"Carpeta vaciada (fast): {p} ({counts['moved']} entradas a papelera, "
+                      f"{counts['deleted']} borradas en el momento, {time.monotonic() - t0:.2f} s)")
+
+        # Se purga todo lo que haya en la papelera, incluidos restos de corridas anteriores
+        pending = [e.path for e in os.scandir(trash_root) if e.is_dir(follow_symlinks=False)]
+        if self.purge == "background":
+            subprocess.Popen(["rm", "-rf", "--", *pending], start_new_session=True,
+                             stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            self.log.info(f"Purga en segundo plano: {len(pending)} lote(s) en {trash_root}")
+        elif self.purge == "parallel":
+            t0 = time.monotonic()
+            for d in pending: self._purge_parallel(d)
+            self.log.info(f"Papelera purgada: {trash_root} ({time.monotonic() - t0:.2f} s)")
+        return {"moved": counts["moved"], "deleted": counts["deleted"], "trash": batch}
@@ -4,11 +4,46 @@ from airflow.utils.context import Context
 from utils.gcs_service import GCSService
 
 class GCSUploadOperator(BaseOperator):
-    template_fields = ("bucket","credentials","local_dir","input_pattern","output_basename")
-    def __init__(self, *, bucket: str, credentials: str | None, local_dir: str, input_pattern: str, output_basename: str, **kwargs):
+    template_fields = ("bucket","credentials","local_dir","input_pattern","output_basename","csv_options")
+    def __init__(
+        self,
+        *,
+        bucket: str,
+        credentials: str | None,
+        local_dir: str,
+        input_pattern: str,
+        output_basename: str,
+        csv_options: dict | None = None,   # {"sep": ";", "encoding": "latin-1", "dtypes": {"col": "string"}}
+        row_group_size: int = 128_000,
+        compression: str = "snappy",
+        backup_mode: str = "copy",        # "copy" = 1 upload + copia server-side | "upload" = 2 uploads
+        large_file_threshold_mb: float | None = 256,   # >= umbral: upload paralelo por partes (None = nunca)
+        upload_chunk_mb: int = 32,
+        upload_workers: int = 8,
+        skip_unchanged: bool = True,       # no re-sube si el md5/crc32c remoto coincide con el local
+        **kwargs
+    ):
         super().__init__(**kwargs)
         self.bucket = bucket; self.credentials = credentials
         self.local_dir = local_dir; self.input_pattern = input_pattern; self.output_basename = output_basename
+        self.csv_options = csv_options
+        self.row_group_size = row_group_size; self.compression = compression
+        self.backup_mode = backup_mode
+        self.large_file_threshold_mb = large_file_threshold_mb
+        self.upload_chunk_mb = upload_chunk_mb; self.upload_workers = upload_workers
+        self.skip_unchanged = skip_unchanged
     def execute(self, context: Context):
-        svc = GCSService(self.bucket, self.credentials)
-        return svc.upload_raw_and_backup(self.local_dir, self.input_pattern, self.output_basename)
+        svc = GCSService(
+            self.bucket, self.credentials,
+            large_file_threshold_mb=self.large_file_threshold_mb,
+            chunk_size_mb=self.upload_chunk_mb, upload_workers=self.upload_workers,
+        )
+        parquet_path = svc.upload_raw_and_backup(
+            self.local_dir, self.input_pattern, self.output_basename,
+            csv_options=self.csv_options, row_group_size=self.row_group_size, compression=self.compression,
+            backup_mode=self.backup_mode, skip_unchanged=self.skip_unchanged,
+        )
+        if svc.last_result.get("raw_skipped"):
+            self.log.info("Contenido sin cambios en %s: upload omitido", svc.last_result["raw_uri"])
+        context["ti"].xcom_push(key="gcs_upload", value=svc.last_result)
+        return parquet_path
@@ -1,11 +1,15 @@
 # /opt/airflow/plugins/operators/merge_process_operator.py
 from __future__ import annotations
 
-import os, sys, glob, re
-from typing import List, Tuple
+import os, sys, glob, json, fnmatch
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import List, Optional, Tuple
 from datetime import datetime
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
 from airflow.models import BaseOperator
 from airflow.utils.context import Context
 
@@ -19,56 +23,103 @@ for p in (AIRFLOW_HOME, os.path.join(AIRFLOW_HOME, "plugins")):
 # Import tolerante al layout de plugins
 try:
     from plugins.utils.custom_logger import CustomLogger
+    from plugins.utils import tabular_io
+    from plugins.utils.hash_join import HashJoinIndex
+    from plugins.utils.schema_plan import SchemaPlanCache
+    from plugins.utils.dedup_index import UniqueIdIndex
+    from plugins.utils.file_discovery import discover_files
 except ImportError:
     from utils.custom_logger import CustomLogger  # fallback si existe legacy
+    from utils import tabular_io
+    from utils.hash_join import HashJoinIndex
+    from utils.schema_plan import SchemaPlanCache
+    from utils.dedup_index import UniqueIdIndex
+    from utils.file_discovery import discover_files
 
 
 class MergeProcessOperator(BaseOperator):
     """
-    Une el Calls Detail (SIT_LZ_CALLDETAIL.csv) con los CSV de campañas (Generali / Generali Alt).
+    Une el Calls Detail (SIT_LZ_CALLDETAIL.csv) con los CSV de campañas (Generali / Generali Alt / ...).
     - Acepta rutas directas en config["campaign_files"]; si no, usa glob tolerante
       para encontrar archivos con variantes "generali"/"generalli" y "alt".
+    - Procesa N archivos de campaña en paralelo (config["campaign_workers"]) y etiqueta
+      call_source según config["campaign_labels"] ({patrón glob: etiqueta}); por defecto
+      Generali / GeneraliAlt. Por defecto se usa sólo el archivo más reciente de cada
+      etiqueta (config["campaign_latest_per_label"] = True, como siempre); con False se
+      unen todos los que matchean (p.ej. varios días exportados en la misma carpeta).
     - Si falta el CSV base, continúa con ALT (emite warning).
+    - Lectura con pyarrow.csv multihilo (config["csv_engine"] = "pyarrow" | "python").
+      Las filas malformadas se descartan pero quedan en config["quarantine_dir"]
+      (por defecto "<local_path>_quarantine", fuera de la carpeta que se vacía).
+    - config["merge_mode"] = "memory" (por defecto) | "streaming": en streaming el
+      calls detail se une por bloques de config["merge_chunk_rows"] filas.
+    - config["output_format"] = "csv" (por defecto) | "parquet": Parquet tipado
+      (DID Int64, resto string, dictionary encoding) listo para subir a GCS tal cual.
+    - Normalización/alias/renombres vía planes compilados por cabecera, cacheados
+      en config["schema_cache_path"] (por defecto $AIRFLOW_HOME/data/cache/).
+    - config["dedup_index"] = True descarta las llamadas cuyo uniqueid ya se emitió en
+      corridas previas (índice SQLite en config["dedup_index_path"], con retención de
+      config["dedup_retention_days"] días). Los ids de la corrida quedan pendientes
+      hasta que `commit_dedup` los confirma tras la carga a BigQuery.
+    - config["compact_memory"] = True lee las columnas de baja cardinalidad
+      (CATEGORY_COLUMNS o config["category_columns"]) como category desde el parser
+      hasta el join, y reporta la memoria antes/después en el log.
     """
     template_fields = ("config",)
 
+    # Renombres (versión lower/underscore)
+    RENAME_MAP = {
+        'no._agent': 'agent_number',
+        'agent': 'agent_name',
+        'start_time': 'start_time',
+        'end_time': 'end_time',
+        'duration': 'call_duration',
+        'duration_wait': 'wait_duration',
+        'queue': 'call_queue',
+        'type': 'call_type',
+        'phone_x': 'phone_number_x',
+        'phone_y': 'phone_number_y',
+        'transfer': 'call_transfer',
+        'status': 'call_status',
+        'did': 'direct_inward_dialing',
+        'uniqueid': 'uniqueid',
+        'status_call': 'call_status_detail',
+        'agente': 'agent',
+        'date_&_time': 'datetime',
+        'duration(seg)': 'duration_seconds',
+        'cedula/ruc': 'id_number',
+        'first_name': 'first_name',
+        'last_name': 'last_name',
+        'seleccione_la_cartera': 'portfolio',
+        'tipo_de_atención': 'attention_type',
+        'estado': 'state',
+        'motivo': 'reason',
+        'source': 'call_source',
+    }
+    # Si cambia el RENAME_MAP, los planes de merge cacheados dejan de valer
+    _RENAME_SALT = json.dumps(RENAME_MAP, sort_keys=True)
+
+    PHONE_COLUMNS = ('phone', 'phone_number', 'telefono', 'telefone', 'phone_')
+
+    # Columnas de baja cardinalidad (nombre canónico) para compact_memory
+    CATEGORY_COLUMNS = (
+        'agent_name', 'agent', 'call_queue', 'call_status', 'call_status_detail', 'call_type',
+        'portfolio', 'attention_type', 'state', 'reason', 'call_source',
+    )
+
     def __init__(self, *, config: dict, **kwargs):
         super().__init__(**kwargs)
         self.config = config or {}
+        self._plans: Optional[SchemaPlanCache] = None
 
     # ----------------------- helpers -----------------------
 
     def _glob_many(self, base: str, patterns) -> List[str]:
         """
-        Case-insensitive glob:
-        - Convierte cada patrón con * y ? a regex
-        - Compara contra los nombres del dir ignorando mayúsculas/minúsculas
-        - Devuelve rutas únicas ordenadas por mtime desc
+        Case-insensitive glob (* y ?) sobre `base` en una sola pasada de scandir.
+        Devuelve rutas únicas ordenadas por mtime desc.
         """
-        if isinstance(patterns, str):
-            patterns = [patterns]
-        try:
-            entries = os.listdir(base)
-        except FileNotFoundError:
-            return []
-
-        regexes = []
-        for pat in patterns:
-            pat = pat.strip()
-            if not pat:
-                continue
-            # a regex, pero insensible a mayúsculas
-            rx = '^' + re.escape(pat).replace(r'\*', '.*').replace(r'\?', '.') + '$'
-            regexes.append(re.compile(rx, flags=re.IGNORECASE))
-
-        hits = set()
-        for name in entries:
-            for rx in regexes:
-                if rx.match(name):
-                    hits.add(os.path.join(base, name))
-                    break
-
-        return sorted(hits, key=lambda p: os.path.getmtime(p), reverse=True)
+        return [p for p, _ in discover_files(base, patterns)]
 
     @staticmethod
     def _normcols(df: pd.DataFrame) -> pd.DataFrame:
@@ -92,11 +143,247 @@ class MergeProcessOperator(BaseOperator):
         raise KeyError(f"[{label}] No se encontró columna 'uniqueid' (ni alias).")
 
     @staticmethod
-    def _cast_phone_if_exists(df: pd.DataFrame) -> None:
-        for c in ('phone', 'phone_number', 'telefono', 'telefone', 'phone_'):
-            if c in df.columns:
-                df[c] = df[c].astype(str)
-                break
+    def _campaign_label(path: str, label_map) -> str:
+        """
+        Etiqueta call_source de un archivo de campaña. `label_map` es
+        {patrón glob: etiqueta} (o lista de pares), se evalúa en orden y sin
+        distinguir mayúsculas. Sin mapping: 'GeneraliAlt' si el nombre es
+        variante alt, si no 'Generali'.
+        """
+        bn = os.path.basename(path).lower()
+        items = label_map.items() if isinstance(label_map, dict) else label_map
+        for pattern, label in items:
+            if fnmatch.fnmatchcase(bn, str(pattern).lower()):
+                return label
+        if any(k in bn for k in (" alt", "_alt", "-alt", "alt.")):
+            return 'GeneraliAlt'
+        return 'Generali'
+
+    def _dictionary_columns(self, path: str, header: int, label: str, category_columns) -> List[str]:
+        """Columnas crudas del archivo cuyo nombre canónico es de baja cardinalidad."""
+        if not category_columns:
+            return []
+        raw = tabular_io.read_header(path, header=header)
+        plan = self._file_plan(raw, label)
+        return [r for r, n in zip(raw, plan["columns"]) if self.RENAME_MAP.get(n, n) in category_columns]
+
+    def _read_csv(self, path: str, *, header: int, engine: str, quarantine_dir: str, label: str,
+                  dictionary_columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Lee el CSV como texto. Si el engine pyarrow no puede con el archivo
+        (encoding, quoting raro), reintenta con el engine python.
+        """
+        try:
+            df, rejected, qfile = tabular_io.read_csv(
+                path, header=header, engine=engine, quarantine_dir=quarantine_dir,
+                dictionary_columns=dictionary_columns,
+            )
+        except (pa.ArrowInvalid, UnicodeDecodeError) as e:
+            if engine == "python":
+                raise
+            self.log.warning("[%s] pyarrow no pudo leer %s (%s). Reintentando con engine python.", label, path, e)
+            df, rejected, qfile = tabular_io.read_csv(
+                path, header=header, engine="python", quarantine_dir=quarantine_dir,
+                dictionary_columns=dictionary_columns,
+            )
+        if rejected:
+            self.log.warning("[%s] %s filas malformadas descartadas -> %s", label, rejected, qfile)
+        return df
+
+    # ----------------------- planes de columnas -----------------------
+
+    def _file_plan(self, columns, label: str) -> dict:
+        """
+        Plan compilado para una cabecera cruda: nombres normalizados (_normcols),
+        alias de uniqueid resuelto (_ensure_uniqueid) y columna de teléfono a
+        castear. Se cachea por hash de la cabecera; sólo se recompila si el
+        layout es nuevo.
+        """
+        key = SchemaPlanCache.header_key("file", columns)
+        plan = self._plans.get(key)
+        if plan is None:
+            self.log.info("[%s] Layout de cabecera desconocido (%s); reconstruyendo plan de columnas.",
+                          label, key[:12])
+            probe = self._normcols(pd.DataFrame(columns=list(columns)))
+            self._ensure_uniqueid(probe, label)
+            phone = next((c for c in self.PHONE_COLUMNS if c in probe.columns), None)
+            plan = {"columns": list(probe.columns), "phone": phone}
+            self._plans.put(key, plan)
+        return plan
+
+    def _merge_plan(self, columns) -> dict:
+        """Plan de renombres (RENAME_MAP) + DID numérico para las columnas del merge."""
+        key = SchemaPlanCache.header_key("merge", columns, salt=self._RENAME_SALT)
+        plan = self._plans.get(key)
+        if plan is None:
+            self.log.info("Layout de merge desconocido (%s); reconstruyendo plan de renombres.", key[:12])
+            cols = [self.RENAME_MAP.get(c, c) for c in columns]
+            plan = {"columns": cols, "did": 'direct_inward_dialing' in cols}
+            self._plans.put(key, plan)
+        return plan
+
+    def _prepare(self, df: pd.DataFrame, label: str) -> pd.DataFrame:
+        """Aplica el plan de la cabecera en una sola pasada."""
+        plan = self._file_plan(df.columns, label)
+        df.columns = plan["columns"]
+        if plan["phone"]:
+            df[plan["phone"]] = df[plan["phone"]].astype(str)
+        return df
+
+    def _finalize(self, dff: pd.DataFrame, fecha_carga: str) -> pd.DataFrame:
+        """Renombres, DID numérico y sello fecha_carga sobre el resultado del merge."""
+        plan = self._merge_plan(dff.columns)
+        dff.columns = plan["columns"]
+
+        # DID a número si existe (permite nulos)
+        if plan["did"]:
+            dff['direct_inward_dialing'] = (
+                pd.to_numeric(dff['direct_inward_dialing'].replace('-', pd.NA), errors='coerce')
+                  .astype('Int64')
+            )
+
+        dff['fecha_carga'] = fecha_carga
+        return dff
+
+    def _merge_streaming(
+        self, calls_detail_path: str, camp_paths: List[str], df_camps: pd.DataFrame, out_path: str, *,
+        chunk_rows: int, csv_engine: str, quarantine_dir: str, fecha_carga: str, output_format: str,
+        dictionary_columns: Optional[List[str]] = None, dedup: Optional[UniqueIdIndex] = None,
+    ) -> Tuple[int, int, int]:
+        """
+        Hash join por bloques: indexa las campañas (lado chico) una vez y pasa
+        el calls detail por el índice en bloques de `chunk_rows`, agregando cada
+        bloque unido al archivo de salida. La memoria pico depende del bloque, no
+        del volumen del día. Mismas filas y columnas que el merge en memoria.
+        """
+        camps_bytes = sum(os.path.getsize(p) for p in camp_paths if os.path.exists(p))
+        if camps_bytes > os.path.getsize(calls_detail_path):
+            self.log.warning("Las campañas (%s bytes) pesan más que el calls detail; "
+                             "el índice hash se arma igual sobre campañas.", camps_bytes)
+        index = HashJoinIndex(df_camps, 'uniqueid')
+        self.log.info("Merge streaming: índice sobre %s filas de campañas, bloques de %s filas",
+                      len(index), chunk_rows)
+
+        engines = [csv_engine] if csv_engine == 'python' else [csv_engine, 'python']
+        for engine in engines:
+            stats: dict = {}
+            rows = cols = dropped = 0
+            n_chunks = 0
+            try:
+                with tabular_io.frame_writer(out_path, output_format) as sink:
+                    for chunk in tabular_io.iter_csv(
+                        calls_detail_path, chunk_rows=chunk_rows, header=0, engine=engine,
+                        quarantine_dir=quarantine_dir, stats=stats, dictionary_columns=dictionary_columns,
+                    ):
+                        chunk = self._prepare(chunk, "calls_detail")
+                        chunk, n_seen = self._drop_seen(chunk, dedup)
+                        dropped += n_seen
+                        part = self._join_chunk(index, chunk, fecha_carga)
+                        if dedup is not None:
+                            dedup.add(part['uniqueid'])
+                        sink.write(part)
+                        n_chunks += 1
+                        rows += len(part)
+                        cols = len(part.columns)
+
+                    if n_chunks == 0:
+                        # Calls detail sin filas: igual dejamos la salida con cabecera/schema
+                        names = tabular_io.read_header(calls_detail_path, header=0)
+                        empty = self._prepare(pd.DataFrame(columns=names, dtype=str), "calls_detail")
+                        part = self._join_chunk(index, empty, fecha_carga)
+                        sink.write(part)
+                        cols = len(part.columns)
+            except (pa.ArrowInvalid, UnicodeDecodeError) as e:
+                if engine == 'python':
+                    raise
+                self.log.warning("[calls_detail] pyarrow no pudo leer %s (%s). Reintentando con engine python.",
+                                 calls_detail_path, e)
+                continue
+            break
+
+        if stats.get('rejected'):
+            self.log.warning("[calls_detail] %s filas malformadas descartadas -> %s",
+                             stats['rejected'], stats.get('quarantine_file'))
+        self.log.info("Merge streaming: %s bloques procesados", n_chunks)
+        return rows, cols, dropped
+
+    def _log_memory(self, label: str, df: pd.DataFrame) -> None:
+        actual, as_object = tabular_io.memory_report(df)
+        self.log.info("Memoria %s: %.1f MB compacto vs %.1f MB como object (%.1fx)",
+                      label, actual / 2**20, as_object / 2**20, as_object / max(actual, 1))
+
+    @staticmethod
+    def _drop_seen(df: pd.DataFrame, dedup: Optional[UniqueIdIndex]) -> Tuple[pd.DataFrame, int]:
+        """Quita las llamadas cuyo uniqueid ya fue emitido en corridas anteriores."""
+        if dedup is None or df.empty:
+            return df, 0
+        mask = dedup.seen_mask(df['uniqueid'].astype(str))
+        n_seen = int(mask.sum())
+        if n_seen:
+            df = df.loc[~mask].reset_index(drop=True)
+        return df, n_seen
+
+    def _join_chunk(self, index: HashJoinIndex, chunk: pd.DataFrame, fecha_carga: str) -> pd.DataFrame:
+        chunk['uniqueid'] = chunk['uniqueid'].astype(str)
+        return self._finalize(index.join(chunk), fecha_carga)
+
+    def _merge_and_write(
+        self, df_calls: Optional[pd.DataFrame], df_camps: pd.DataFrame, out_path: str, *,
+        calls_detail_path: str, camp_paths: List[str], merge_mode: str, chunk_rows: int,
+        csv_engine: str, quarantine_dir: str, fecha_carga: str, output_format: str,
+        dictionary_columns: Optional[List[str]], compact: bool, dedup: Optional[UniqueIdIndex],
+    ) -> Tuple[int, int, int]:
+        """Merge (en memoria o streaming) + escritura. Devuelve (filas, columnas, descartadas por dedup)."""
+        if merge_mode == 'streaming':
+            rows, cols, dropped = self._merge_streaming(
+                calls_detail_path, camp_paths, df_camps, out_path,
+                chunk_rows=chunk_rows, csv_engine=csv_engine,
+                quarantine_dir=quarantine_dir, fecha_carga=fecha_carga, output_format=output_format,
+                dictionary_columns=dictionary_columns, dedup=dedup,
+            )
+            if compact:
+                self._log_memory("campañas (índice)", df_camps)
+            return rows, cols, dropped
+
+        df_calls, dropped = self._drop_seen(df_calls, dedup)
+
+        # Merge
+        dff = df_calls.merge(df_camps, on='uniqueid', how='inner')
+        dff = self._finalize(dff, fecha_carga)
+        if compact:
+            self._log_memory("merge", dff)
+
+        # Escribe salida
+        with tabular_io.frame_writer(out_path, output_format) as sink:
+            sink.write(dff)
+        if dedup is not None:
+            dedup.add(dff['uniqueid'])
+        return len(dff), len(dff.columns), dropped
+
+    # ----------------------- dedup -----------------------
+
+    @staticmethod
+    def dedup_index_path(cfg: dict) -> str:
+        """Índice de uniqueid de un config PM1 (uno por archivo final)."""
+        final_file = cfg.get('final_file_name', 'SIT_BK_FINAL_MERGE.csv')
+        stem, ext = os.path.splitext(final_file)
+        if ext.lower() not in ('.csv', '.parquet'):
+            stem = final_file
+        return cfg.get('dedup_index_path') or os.path.join(AIRFLOW_HOME, 'data', 'cache', f"merge_uniqueid_{stem}.sqlite")
+
+    @staticmethod
+    def dedup_run_key(run_id: Optional[str]) -> str:
+        return str(run_id or datetime.now().strftime('manual__%Y-%m-%d'))
+
+    @classmethod
+    def commit_dedup(cls, cfg: dict, run_id: Optional[str]) -> int:
+        """
+        Confirma los uniqueid que emitió la corrida `run_id` con este config; se llama
+        después de que la carga a BigQuery terminó bien. Sin dedup_index no hace nada.
+        """
+        if not cfg.get('dedup_index', False):
+            return 0
+        return UniqueIdIndex.commit_run(cls.dedup_index_path(cfg), cls.dedup_run_key(run_id))
 
     # ----------------------- execute -----------------------
 
@@ -105,11 +392,35 @@ class MergeProcessOperator(BaseOperator):
         local_path = cfg.get('local_path', '/opt/airflow/data/Extracted_generali')
         os.makedirs(local_path, exist_ok=True)
 
+        output_format = str(cfg.get('output_format', 'csv')).lower()
+        if output_format not in tabular_io.OUTPUT_FORMATS:
+            raise ValueError("output_format inválido; usa 'csv' o 'parquet'")
+
         final_file = cfg.get('final_file_name', 'SIT_BK_FINAL_MERGE.csv')
-        if not final_file.endswith('.csv'):
-            final_file += '.csv'
+        stem, ext = os.path.splitext(final_file)
+        if ext.lower() in ('.csv', '.parquet'):
+            final_file = stem
+        final_file += '.parquet' if output_format == 'parquet' else '.csv'
         out_path = os.path.join(local_path, final_file)
 
+        csv_engine = cfg.get('csv_engine', 'pyarrow')
+        quarantine_dir = cfg.get('quarantine_dir') or (os.path.normpath(local_path) + '_quarantine')
+
+        self._plans = SchemaPlanCache(
+            cfg.get('schema_cache_path') or os.path.join(AIRFLOW_HOME, 'data', 'cache', 'merge_schema_plans.json')
+        )
+
+        merge_mode = cfg.get('merge_mode', 'memory')
+        if merge_mode not in ('memory', 'streaming'):
+            raise ValueError("merge_mode inválido; usa 'memory' o 'streaming'")
+        chunk_rows = int(cfg.get('merge_chunk_rows', 200_000))
+
+        compact = bool(cfg.get('compact_memory', False))
+        category_columns = set(cfg.get('category_columns') or self.CATEGORY_COLUMNS) if compact else set()
+
+        label_map = cfg.get('campaign_labels') or {}
+        latest_per_label = bool(cfg.get('campaign_latest_per_label', True))
+
         # Calls detail
         calls_detail_path = cfg.get('calls_detail_path') or os.path.join(local_path, 'SIT_LZ_CALLDETAIL.csv')
         if not os.path.exists(calls_detail_path):
@@ -130,127 +441,108 @@ class MergeProcessOperator(BaseOperator):
                 '*generali*.csv', '*generalli*.csv',
             ])
 
-        # Clasifica base vs alt
-        def is_alt(path: str) -> bool:
-            bn = os.path.basename(path).lower()
-            return any(k in bn for k in (" alt", "_alt", "-alt", "alt."))
-
-        primaries = [p for p in campaign_files if not is_alt(p)]
-        alts      = [p for p in campaign_files if is_alt(p)]
-
-        # Selecciona el más reciente de cada tipo (si existiera)
-        gen_path = primaries[0] if primaries else None
-        alt_path = alts[0] if alts else None
+        # Etiqueta (call_source) de cada archivo de campaña
+        labels = [self._campaign_label(p, label_map) for p in campaign_files]
+        if latest_per_label:
+            # campaign_files viene ordenado por mtime desc: el primero de cada etiqueta es el más reciente
+            picked, seen = [], set()
+            for p, lb in zip(campaign_files, labels):
+                if lb not in seen:
+                    seen.add(lb)
+                    picked.append((p, lb))
+        else:
+            picked = list(zip(campaign_files, labels))
 
         # Logging de diagnóstico
         try:
             self.log.info("Merge local_path: %s", local_path)
             self.log.info("Calls detail path: %s", calls_detail_path)
-            self.log.info("Campaign base (mas reciente): %s", gen_path)
-            self.log.info("Campaign alt  (mas reciente): %s", alt_path)
+            self.log.info("Campaign files a procesar (%s): %s", len(picked), picked[:20])
             self.log.info("Campaign files (all candidates): %s", campaign_files[:10])
             self.log.info("Dir listing (sample): %s", os.listdir(local_path)[:50])
         except Exception:
             pass
 
-        # Si no hay base pero sí ALT, continuar con ALT (warning)
-        if not gen_path and alt_path:
-            self.log.warning("No se encontró CSV base (Generali/Generalli). Continuando SOLO con ALT.")
         # Si no hay ninguno, error duro
-        if not gen_path and not alt_path:
+        if not picked:
             raise FileNotFoundError(
-                "No se encontraron CSV de campañas (ni base ni alt). "
+                "No se encontraron CSV de campañas. "
                 f"Busqué en {local_path} y en config['campaign_files']."
             )
+        # Si no hay base pero sí ALT, continuar con ALT (warning)
+        if not label_map and 'Generali' not in {lb for _, lb in picked}:
+            self.log.warning("No se encontró CSV base (Generali/Generalli). Continuando SOLO con ALT.")
 
-        # --- LEER CSVs ---
+        # --- LEER CSVs (en paralelo: el tiempo lo marca el archivo más grande) ---
+
+        def _read_campaign(path: str, label: str) -> pd.DataFrame:
+            tag = f"campaña:{os.path.basename(path)}"
+            dict_cols = self._dictionary_columns(path, 1, tag, category_columns)
+            df = self._read_csv(path, header=1, engine=csv_engine, quarantine_dir=quarantine_dir, label=tag,
+                                dictionary_columns=dict_cols)
+            df = self._prepare(df, tag)
+            if 'call_source' in category_columns:
+                df['source'] = pd.Categorical.from_codes(np.zeros(len(df), dtype=np.int8), categories=[label])
+            else:
+                df['source'] = label  # normalizamos etiqueta
+            return df
+
+        def _read_calls() -> pd.DataFrame:
+            df = self._read_csv(
+                calls_detail_path, header=0, engine=csv_engine, quarantine_dir=quarantine_dir, label="calls_detail",
+                dictionary_columns=calls_dict_cols,
+            )
+            df = self._prepare(df, "calls_detail")
+            df['uniqueid'] = df['uniqueid'].astype(str)
+            return df
 
-        # Calls detail
-        df_calls = pd.read_csv(calls_detail_path, dtype=str, engine='python', on_bad_lines='skip')
-        df_calls = self._normcols(df_calls)
-        self._ensure_uniqueid(df_calls, "calls_detail")
-        self._cast_phone_if_exists(df_calls)
-
-        # Campañas (1..2)
-        dfs_camps: List[Tuple[str, pd.DataFrame]] = []
-
-        if gen_path:
-            df1 = pd.read_csv(gen_path, header=1, dtype=str, engine='python', on_bad_lines='skip')
-            df1 = self._normcols(df1)
-            self._ensure_uniqueid(df1, "campaña_base")
-            self._cast_phone_if_exists(df1)
-            df1['source'] = 'Generali'  # normalizamos etiqueta
-            dfs_camps.append(("Generali", df1))
-
-        if alt_path:
-            df2 = pd.read_csv(alt_path, header=1, dtype=str, engine='python', on_bad_lines='skip')
-            df2 = self._normcols(df2)
-            self._ensure_uniqueid(df2, "campaña_alt")
-            self._cast_phone_if_exists(df2)
-            df2['source'] = 'GeneraliAlt'
-            dfs_camps.append(("GeneraliAlt", df2))
-
-        if not dfs_camps:
-            raise FileNotFoundError("No hay CSVs de campañas para procesar (ni base ni alt).")
-
-        # Concat campañas
-        df_camps = pd.concat([df for _, df in dfs_camps], ignore_index=True)
+        calls_dict_cols = self._dictionary_columns(calls_detail_path, 0, "calls_detail", category_columns)
 
-        # Tipos comparables para merge
-        df_calls['uniqueid'] = df_calls['uniqueid'].astype(str)
-        df_camps['uniqueid'] = df_camps['uniqueid'].astype(str)
+        workers = max(1, min(int(cfg.get('campaign_workers', 4)), len(picked) + 1))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="merge_read") as pool:
+            # Calls detail (en modo streaming se lee por bloques durante el join)
+            calls_future = pool.submit(_read_calls) if merge_mode != 'streaming' else None
+            camp_futures = [pool.submit(_read_campaign, p, lb) for p, lb in picked]
+            dfs_camps = [f.result() for f in camp_futures]
+            df_calls = calls_future.result() if calls_future else None
 
-        # Merge
-        dff = df_calls.merge(df_camps, on='uniqueid', how='inner')
+        # Concat campañas (una sola vez)
+        df_camps = tabular_io.concat_frames(dfs_camps)
+        del dfs_camps
 
-        # Renombres (versión lower/underscore)
-        rename_map = {
-            'no._agent': 'agent_number',
-            'agent': 'agent_name',
-            'start_time': 'start_time',
-            'end_time': 'end_time',
-            'duration': 'call_duration',
-            'duration_wait': 'wait_duration',
-            'queue': 'call_queue',
-            'type': 'call_type',
-            'phone_x': 'phone_number_x',
-            'phone_y': 'phone_number_y',
-            'transfer': 'call_transfer',
-            'status': 'call_status',
-            'did': 'direct_inward_dialing',
-            'uniqueid': 'uniqueid',
-            'status_call': 'call_status_detail',
-            'agente': 'agent',
-            'date_&_time': 'datetime',
-            'duration(seg)': 'duration_seconds',
-            'cedula/ruc': 'id_number',
-            'first_name': 'first_name',
-            'last_name': 'last_name',
-            'seleccione_la_cartera': 'portfolio',
-            'tipo_de_atención': 'attention_type',
-            'estado': 'state',
-            'motivo': 'reason',
-            'source': 'call_source',
-        }
-        to_rename = {k: v for k, v in rename_map.items() if k in dff.columns and k != v}
-        if to_rename:
-            dff = dff.rename(columns=to_rename)
+        # Tipos comparables para merge
+        df_camps['uniqueid'] = df_camps['uniqueid'].astype(str)
 
-        # DID a número si existe (permite nulos)
-        if 'direct_inward_dialing' in dff.columns:
-            dff['direct_inward_dialing'] = (
-                pd.to_numeric(dff['direct_inward_dialing'].replace('-', pd.NA), errors='coerce')
-                  .astype('Int64')
+        fecha_carga = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+        dedup_ctx = nullcontext(None)
+        if cfg.get('dedup_index', False):
+            run_key = self.dedup_run_key((context or {}).get('run_id'))
+            dedup_ctx = UniqueIdIndex(self.dedup_index_path(cfg), run_key,
+                                      retention_days=int(cfg.get('dedup_retention_days', 30)))
+
+        with dedup_ctx as dedup:
+            if dedup is not None:
+                pruned = dedup.prune()
+                self.log.info("Índice de uniqueid %s: %s ids (podados %s por retención)",
+                              dedup.path, len(dedup), pruned)
+            rows, cols, dropped = self._merge_and_write(
+                df_calls, df_camps, out_path, calls_detail_path=calls_detail_path,
+                camp_paths=[p for p, _ in picked], merge_mode=merge_mode, chunk_rows=chunk_rows,
+                csv_engine=csv_engine, quarantine_dir=quarantine_dir, fecha_carga=fecha_carga,
+                output_format=output_format, dictionary_columns=calls_dict_cols, compact=compact, dedup=dedup,
             )
+            if dedup is not None:
+                self.log.info("Dedup: %s filas de calls detail ya emitidas en corridas previas descartadas", dropped)
 
-        dff['fecha_carga'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-
-        # Escribe salida
-        dff.to_csv(out_path, index=False, encoding='utf-8')
+        try:
+            self._plans.save()
+        except OSError as e:
+            self.log.warning("No se pudo guardar el cache de planes de columnas (%s): %s", self._plans.path, e)
 
         CustomLogger.emit(
-            3, 'merge_and_process_calls', 'PC_MERGE', out_path, 'CSV', 'False',
+            3, 'merge_and_process_calls', 'PC_MERGE', out_path, output_format.upper(), 'False',
             f'Final creado: {out_path}'
         )
-        self.log.info("Archivo final creado: %s (rows=%s, cols=%s)", out_path, len(dff), len(dff.columns))
+        self.log.info("Archivo final creado: %s (rows=%s, cols=%s)", out_path, rows, cols)
         return out_path
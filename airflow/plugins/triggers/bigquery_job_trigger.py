@@ -0,0 +1,94 @@
+from __future__ import annotations
+import asyncio
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+from airflow.triggers.base import BaseTrigger, TriggerEvent
+from google.api_core.exceptions import Forbidden, NotFound
+from utils.gcp_clients import bigquery_client
+
+
+# errores de jobs.get que no se arreglan reintentando
+_FATAL_POLL_ERRORS = (NotFound, Forbidden)
+MAX_BACKOFF = 300.0
+
+
+class BigQueryJobTrigger(BaseTrigger):
+    """
+    Espera en el triggerer a que termine un job de BigQuery ya enviado.
+    El polling (jobs.get) corre en un hilo vía asyncio.to_thread para no bloquear
+    el event loop; el cliente sale del registro de gcp_clients, así que en un test
+    basta con reemplazar `bigquery_client` (o pasar un cliente a `_client`).
+
+    Un error al consultar el job (503, conexión cortada, refresh del token) no
+    significa que el job haya fallado: se reintenta con backoff exponencial
+    (poll_interval * 2^n, tope MAX_BACKOFF). Sólo NotFound/Forbidden, o
+    `max_poll_errors` errores seguidos, terminan en "error".
+
+    Emite un único evento:
+      {"status": "success", "job_id", "location", "job_type", "state"}
+      {"status": "error",   "job_id", "location", "message"}
+    """
+
+    def __init__(
+        self,
+        job_id: str,
+        project: Optional[str] = None,
+        location: Optional[str] = None,
+        credentials: Optional[str] = None,
+        poll_interval: float = 10.0,
+        max_poll_errors: int = 5,
+    ):
+        super().__init__()
+        self.job_id = job_id
+        self.project = project
+        self.location = location
+        self.credentials = credentials
+        self.poll_interval = poll_interval
+        self.max_poll_errors = max_poll_errors
+
+    def serialize(self) -> Tuple[str, Dict[str, Any]]:
+        return (
+            "triggers.bigquery_job_trigger.BigQueryJobTrigger",
+            {
+                "job_id": self.job_id,
+                "project": self.project,
+                "location": self.location,
+                "credentials": self.credentials,
+                "poll_interval": self.poll_interval,
+                "max_poll_errors": self.max_poll_errors,
+            },
+        )
+
+    def _client(self):
+        return bigquery_client(self.credentials, self.project)
+
+    async def run(self) -> AsyncIterator[TriggerEvent]:
+        client = self._client()
+        base = {"job_id": self.job_id, "location": self.location}
+        errors = 0
+        while True:
+            try:
+                job = await asyncio.to_thread(
+                    client.get_job, self.job_id, project=self.project, location=self.location
+                )
+            except Exception as e:
+                errors += 1
+                message = f"{type(e).__name__}: {e}"
+                if isinstance(e, _FATAL_POLL_ERRORS) or errors >= self.max_poll_errors:
+                    yield TriggerEvent({**base, "status": "error", "message": message})
+                    return
+                delay = min(self.poll_interval * 2 ** (errors - 1), MAX_BACKOFF)
+                self.log.warning("Error consultando el job %s (%s/%s): %s; reintento en %ss",
+                                 self.job_id, errors, self.max_poll_errors, message, delay)
+                await asyncio.sleep(delay)
+                continue
+            errors = 0
+            if job.state == "DONE":
+                if job.error_result:
+                    message = job.error_result.get("message") or str(job.error_result)
+                    yield TriggerEvent({**base, "status": "error", "message": message})
+                else:
+                    yield TriggerEvent({**base, "status": "success", "job_type": job.job_type, "state": job.state})
+                return
+            self.log.info("Job %s en estado %s; nuevo chequeo en %ss", self.job_id, job.state, self.poll_interval)
+            await asyncio.sleep(self.poll_interval)
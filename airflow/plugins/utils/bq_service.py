@@ -1,20 +1,74 @@
 from __future__ import annotations
+import json
 import os
-from typing import Literal, Optional
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Literal, Optional, Sequence, Union
 
+import pyarrow as pa
+import pyarrow.parquet as pq
+from google.api_core.exceptions import NotFound
 from google.cloud import bigquery
 from utils.custom_logger import CustomLogger
+from utils.gcp_clients import bigquery_client, storage_client
+from utils.bq_telemetry import job_stats
+from utils.load_schema_cache import LOAD_SCHEMA_CACHE, LoadSchemaCache
+from utils.load_schema import (
+    Fields, csv_header, local_fields, normalize_fields, parquet_fields, sample_blob, schema_diff, split_uri,
+    to_schema_fields, uri_list,
+)
+
+# Uno o varios gs:// URIs (se admite comodín *) para un mismo load job
+GcsUris = Union[str, Sequence[str]]
+
+# Particionado: "campo" (DAY), {"field", "type", "expiration_days", "require_filter"}
+# o "INGESTION" / {"field": None} para particionar por fecha de carga (_PARTITIONTIME)
+PartitionSpec = Union[str, dict]
+_PARTITION_FIELD_TYPES = {"DATE", "TIMESTAMP", "DATETIME"}
+
+
+def to_time_partitioning(spec: Optional[PartitionSpec]) -> Optional[bigquery.TimePartitioning]:
+    if not spec:
+        return None
+    if isinstance(spec, str):
+        spec = {"field": None} if spec.upper() == "INGESTION" else {"field": spec}
+    days = spec.get("expiration_days")
+    return bigquery.TimePartitioning(
+        type_=(spec.get("type") or "DAY").upper(),
+        field=spec.get("field"),
+        expiration_ms=int(days * 86_400_000) if days else None,
+    )
+
 
 class BigQueryService:
     def __init__(self, credentials: str | None = None, project: str | None = None):
-        if credentials:
-            os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = credentials
-        self.client = bigquery.Client(project=project)
+        self.credentials = credentials
+        self.client = bigquery_client(credentials, project)
+        # Stats of every job run through this service (see track_job), for XCom
+        self.job_stats: list = []
+
+    def track_job(self, job, label: Optional[str] = None) -> dict:
+        """Records the stats of a finished job and emits them as a JSON CustomLogger record."""
+        stats = job_stats(job, label)
+        self.job_stats.append(stats)
+        CustomLogger.emit(5, "job_stats", "PCBQ", label or stats["job_id"], "BIGQUERY", "False",
+                          json.dumps(stats, default=str))
+        return stats
 
     def manage_table(self, table_id: str, action: str):
+        """
+        Standalone table management before a load.
+        TRUNCATE uses `TRUNCATE TABLE` (no scan, no bytes billed, no DML quota).
+        For truncate + load prefer `truncate_and_load`, which does both in a
+        single load job.
+        """
         action = (action or "").upper()
         if action == "TRUNCATE":
-            self.client.query(f"DELETE FROM `{table_id}` WHERE TRUE").result()
+            job = self.client.query(f"TRUNCATE TABLE `{table_id}`")
+            job.result()
+            self.track_job(job, table_id)
         elif action == "DROP":
             self.client.delete_table(table_id, not_found_ok=True)
         elif action == "INSERT_INTO":
@@ -25,14 +79,146 @@ class BigQueryService:
 
     def load_from_gcs(
         self,
-        gcs_uri: str,
+        gcs_uri: GcsUris,
         table_id: str,
         source_format: Literal["PARQUET", "CSV"] = "PARQUET",
         write_disposition: Optional[str] = None,
+        schema: Optional[Fields] = None,
+        time_partitioning: Optional[PartitionSpec] = None,
+        clustering_fields: Optional[Sequence[str]] = None,
     ):
+        """Generic loader (blocking): submit_load + wait + log_load. Returns the finished job."""
+        job = self.submit_load(gcs_uri, table_id, source_format, write_disposition, schema,
+                               time_partitioning, clustering_fields)
+        job.result()
+        self.log_load(table_id, len(uri_list(gcs_uri)), job)
+        return job
+
+    def submit_load(
+        self,
+        gcs_uri: GcsUris,
+        table_id: str,
+        source_format: Literal["PARQUET", "CSV"] = "PARQUET",
+        write_disposition: Optional[str] = None,
+        schema: Optional[Fields] = None,
+        time_partitioning: Optional[PartitionSpec] = None,
+        clustering_fields: Optional[Sequence[str]] = None,
+    ) -> bigquery.LoadJob:
         """
-        Generic loader. Default PARQUET.
+        Starts the load job and returns it without waiting (deferrable operators
+        poll it from the triggerer). Default PARQUET.
+        gcs_uri: one URI, a list, or wildcards (gs://b/backup/X_2025-*.parquet); all of
+        them go into a single load job.
+        CSV: with `schema` (see resolve_load_schema) the job gets it explicitly and
+        autodetect is off; without it, autodetect as before.
+        PARQUET is self-describing: `schema` is only used for the drift check upstream.
         """
+        job_config = self._load_config(source_format, write_disposition, schema,
+                                       time_partitioning, clustering_fields)
+        return self.client.load_table_from_uri(uri_list(gcs_uri), table_id, job_config=job_config)
+
+    def submit_local_load(
+        self,
+        path: str,
+        table_id: str,
+        source_format: Literal["PARQUET", "CSV"] = "PARQUET",
+        write_disposition: Optional[str] = None,
+        schema: Optional[Fields] = None,
+        time_partitioning: Optional[PartitionSpec] = None,
+        clustering_fields: Optional[Sequence[str]] = None,
+    ) -> bigquery.LoadJob:
+        """
+        Same as submit_load, but the job data is streamed from a local Parquet/CSV
+        file (load_table_from_file): no intermediate GCS object. Returns once the
+        upload is done and the job exists, without waiting for it.
+        """
+        job_config = self._load_config(source_format, write_disposition, schema,
+                                       time_partitioning, clustering_fields)
+        size = os.path.getsize(path)
+        t0 = time.monotonic()
+        with open(path, "rb") as fh:
+            job = self.client.load_table_from_file(fh, table_id, size=size, job_config=job_config)
+        elapsed = max(time.monotonic() - t0, 1e-6)
+        CustomLogger.emit(5, "load_local", "PCBQ", table_id, "BIGQUERY", "False",
+                          f"{path}: {size / 2**20:.1f} MB enviados en {elapsed:.1f} s (job {job.job_id})")
+        return job
+
+    def load_from_local(
+        self,
+        path: str,
+        table_id: str,
+        source_format: Literal["PARQUET", "CSV"] = "PARQUET",
+        write_disposition: Optional[str] = None,
+        schema: Optional[Fields] = None,
+        time_partitioning: Optional[PartitionSpec] = None,
+        clustering_fields: Optional[Sequence[str]] = None,
+        backup_uri: Optional[str] = None,
+    ):
+        """
+        Blocking local load: submit_local_load + wait + log_load. Returns the finished job.
+        backup_uri (gs://bucket/backup/X_YYYY-MM-DD.parquet): the same file is uploaded
+        there in parallel with the load (see backup_in_background).
+        """
+        with self.backup_in_background(path, backup_uri):
+            job = self.submit_local_load(path, table_id, source_format, write_disposition, schema,
+                                         time_partitioning, clustering_fields)
+            job.result()
+        self.log_load(table_id, 1, job)
+        return job
+
+    def load_from_arrow(
+        self,
+        table: pa.Table,
+        table_id: str,
+        write_disposition: Optional[str] = None,
+        time_partitioning: Optional[PartitionSpec] = None,
+        clustering_fields: Optional[Sequence[str]] = None,
+        compression: str = "snappy",
+    ):
+        """
+        Loads an in-memory Arrow table: serialized once to a Parquet buffer and
+        streamed into a load job (types come from the Arrow schema). Blocking;
+        returns the finished job.
+        """
+        sink = pa.BufferOutputStream()
+        pq.write_table(table, sink, compression=compression)
+        buf = sink.getvalue()
+        job_config = self._load_config("PARQUET", write_disposition, None, time_partitioning, clustering_fields)
+        job = self.client.load_table_from_file(pa.BufferReader(buf), table_id, size=buf.size,
+                                               job_config=job_config)
+        job.result()
+        self.log_load(table_id, 1, job)
+        return job
+
+    @contextmanager
+    def backup_in_background(self, path: str, backup_uri: Optional[str]):
+        """
+        Uploads `path` to `backup_uri` in a background thread while the block runs
+        (the backup stays off the critical path of the load). On exit it waits for
+        the upload; an upload error is raised after a successful block.
+        """
+        if not backup_uri:
+            yield None
+            return
+        from utils.gcs_service import GCSService  # pandas/pyarrow conversion stack, only when needed
+
+        bucket, name = split_uri(backup_uri)
+        pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bq_backup")
+        future = pool.submit(GCSService(bucket, self.credentials).upload_file, path, name)
+        try:
+            yield future
+        finally:
+            pool.shutdown(wait=True)
+        future.result()
+
+    @staticmethod
+    def _load_config(
+        source_format: str,
+        write_disposition: Optional[str],
+        schema: Optional[Fields],
+        time_partitioning: Optional[PartitionSpec],
+        clustering_fields: Optional[Sequence[str]],
+    ) -> bigquery.LoadJobConfig:
         if source_format == "PARQUET":
             job_config = bigquery.LoadJobConfig(
                 source_format=bigquery.SourceFormat.PARQUET,
@@ -42,13 +228,320 @@ class BigQueryService:
             job_config = bigquery.LoadJobConfig(
                 source_format=bigquery.SourceFormat.CSV,
                 skip_leading_rows=1,
-                autodetect=True,
                 write_disposition=write_disposition or bigquery.WriteDisposition.WRITE_APPEND,
             )
+            if schema:
+                job_config.schema = to_schema_fields(schema)
+                job_config.autodetect = False
+            else:
+                job_config.autodetect = True
         else:
             raise ValueError("Unsupported source_format")
 
-        job = self.client.load_table_from_uri(gcs_uri, table_id, job_config=job_config)
-        job.result()
-        t = self.client.get_table(table_id)
-        CustomLogger.emit(5, "load_gcs", "PCBQ", table_id, "BIGQUERY", "False", f"Rows: {t.num_rows}")
+        # Only applied when the job creates the table (see ensure_table_layout for existing ones)
+        partitioning = to_time_partitioning(time_partitioning)
+        if partitioning is not None:
+            job_config.time_partitioning = partitioning
+        if clustering_fields:
+            job_config.clustering_fields = list(clustering_fields)
+
+        return job_config
+
+    def log_load(self, table_id: str, n_uris: int = 1, job=None) -> int:
+        """Emits the loaded row count (from the job stats; get_table only without a job) and the job stats."""
+        rows = job_stats(job)["output_rows"] if job is not None else None
+        if rows is None:
+            rows = self.client.get_table(table_id).num_rows
+        CustomLogger.emit(5, "load_gcs", "PCBQ", table_id, "BIGQUERY", "False",
+                          f"Rows: {rows}" + (f" ({n_uris} URIs)" if n_uris > 1 else ""))
+        if job is not None:
+            self.track_job(job, table_id)
+        return rows
+
+    def loader(self, gcs_uri: Optional[GcsUris], local_path: Optional[str], wait: bool = True):
+        """(load method, source kwargs) for a GCS or a local source."""
+        if local_path:
+            return (self.load_from_local if wait else self.submit_local_load), {"path": local_path}
+        if not gcs_uri:
+            raise ValueError("gcs_uri or local_path is required")
+        return (self.load_from_gcs if wait else self.submit_load), {"gcs_uri": gcs_uri}
+
+    def truncate_and_load(
+        self,
+        gcs_uri: Optional[GcsUris],
+        table_id: str,
+        source_format: Literal["PARQUET", "CSV"] = "PARQUET",
+        schema: Optional[Fields] = None,
+        time_partitioning: Optional[PartitionSpec] = None,
+        clustering_fields: Optional[Sequence[str]] = None,
+        wait: bool = True,
+        local_path: Optional[str] = None,
+    ):
+        """
+        TRUNCATE + load as ONE load job with WRITE_TRUNCATE: the table is replaced
+        atomically when the job succeeds (and left untouched if it fails).
+        Note: with WRITE_TRUNCATE the table takes the schema of the source file.
+        wait=False only submits the job (see submit_load).
+        local_path loads a local file instead of gcs_uri (see submit_local_load).
+        """
+        CustomLogger.emit(5, "manage_table", "PCBQ", table_id, "BIGQUERY", "False", "ACTION: TRUNCATE (WRITE_TRUNCATE)")
+        load, source = self.loader(gcs_uri, local_path, wait)
+        return load(
+            **source,
+            table_id=table_id,
+            source_format=source_format,
+            write_disposition=bigquery.WriteDisposition.WRITE_TRUNCATE,
+            schema=schema,
+            time_partitioning=time_partitioning,
+            clustering_fields=clustering_fields,
+        )
+
+    def row_count(self, table_id: str) -> Optional[int]:
+        """Current rows of `table_id` (table metadata, no query); None if it does not exist."""
+        try:
+            return self.client.get_table(table_id).num_rows
+        except NotFound:
+            return None
+
+    def load_via_staging(
+        self,
+        gcs_uri: Optional[GcsUris],
+        table_id: str,
+        action: str,
+        source_format: Literal["PARQUET", "CSV"] = "PARQUET",
+        swap_method: Literal["copy", "rename"] = "copy",
+        staging_suffix: str = "__staging",
+        min_rows: int = 1,
+        min_row_ratio: Optional[float] = None,
+        staging_ttl_hours: int = 24,
+        schema: Optional[Fields] = None,
+        time_partitioning: Optional[PartitionSpec] = None,
+        clustering_fields: Optional[Sequence[str]] = None,
+        local_path: Optional[str] = None,
+    ) -> int:
+        """
+        Loads into `<table_id><staging_suffix>`, validates it and only then swaps it
+        into place, so readers never see the target empty or missing and a failed
+        load leaves the previous data untouched.
+
+        Validation: the staging row count must match the load job output and be
+        >= min_rows; with min_row_ratio, also >= ratio * current target rows.
+        Swap:
+          - "copy" (default): copy job staging -> target (WRITE_TRUNCATE for
+            TRUNCATE/DROP, WRITE_APPEND for INSERT_INTO); atomic, then staging is dropped.
+          - "rename": DROP target + ALTER TABLE staging RENAME TO target in one
+            script (TRUNCATE/DROP only); avoids the copy but has a sub-second gap.
+        The staging table gets an expiration so a failed run does not leave it behind.
+        local_path loads a local file instead of gcs_uri.
+        Returns the number of rows swapped in.
+        """
+        action = (action or "").upper()
+        if action not in ("TRUNCATE", "DROP", "INSERT_INTO"):
+            raise ValueError("Invalid action")
+        if swap_method not in ("copy", "rename"):
+            raise ValueError("swap_method must be 'copy' or 'rename'")
+        if swap_method == "rename" and action == "INSERT_INTO":
+            raise ValueError("swap_method='rename' replaces the table; use 'copy' for INSERT_INTO")
+
+        staging_id = f"{table_id}{staging_suffix}"
+        load, source = self.loader(gcs_uri, local_path)
+        job = load(
+            **source,
+            table_id=staging_id,
+            source_format=source_format,
+            write_disposition=bigquery.WriteDisposition.WRITE_TRUNCATE,
+            schema=schema,
+            time_partitioning=time_partitioning,
+            clustering_fields=clustering_fields,
+        )
+        staging = self.client.get_table(staging_id)
+        staging.expires = datetime.now(timezone.utc) + timedelta(hours=staging_ttl_hours)
+        self.client.update_table(staging, ["expires"])
+
+        # ----- validación -----
+        rows = staging.num_rows
+        current = self.row_count(table_id)
+        problems = []
+        if job.output_rows is not None and rows != job.output_rows:
+            problems.append(f"staging rows {rows} != load output {job.output_rows}")
+        if rows < min_rows:
+            problems.append(f"staging rows {rows} < min_rows {min_rows}")
+        if min_row_ratio is not None and current and rows < min_row_ratio * current:
+            problems.append(f"staging rows {rows} < {min_row_ratio:.0%} of current {current}")
+        if problems:
+            CustomLogger.emit(5, "load_staging", "PCBQ", table_id, "BIGQUERY", "True", "; ".join(problems))
+            raise ValueError(f"Staging validation failed for {table_id}: " + "; ".join(problems))
+
+        # ----- swap -----
+        if swap_method == "copy":
+            disposition = (bigquery.WriteDisposition.WRITE_APPEND if action == "INSERT_INTO"
+                           else bigquery.WriteDisposition.WRITE_TRUNCATE)
+            copy_config = bigquery.CopyJobConfig(write_disposition=disposition)
+            copy_job = self.client.copy_table(staging_id, table_id, job_config=copy_config)
+            copy_job.result()
+            self.track_job(copy_job, table_id)
+            target = self.client.get_table(table_id)
+            if target.expires is not None:
+                # a freshly created target must not inherit the staging expiration
+                target.expires = None
+                self.client.update_table(target, ["expires"])
+            self.client.delete_table(staging_id, not_found_ok=True)
+        else:
+            target_name = table_id.split(".")[-1]
+            swap_job = self.client.query(
+                f"DROP TABLE IF EXISTS `{table_id}`;\n"
+                f"ALTER TABLE `{staging_id}` SET OPTIONS (expiration_timestamp = NULL);\n"
+                f"ALTER TABLE `{staging_id}` RENAME TO `{target_name}`;"
+            )
+            swap_job.result()
+            self.track_job(swap_job, table_id)
+
+        CustomLogger.emit(
+            5, "load_staging", "PCBQ", table_id, "BIGQUERY", "False",
+            f"ACTION: {action} via staging ({swap_method}); Rows: {rows} (antes: {current})",
+        )
+        return rows
+
+    # ----------------------- load schemas -----------------------
+
+    def resolve_load_schema(
+        self,
+        gcs_uri: Optional[GcsUris],
+        table_id: str,
+        source_format: Literal["PARQUET", "CSV"] = "PARQUET",
+        declared: Optional[object] = None,
+        cache_path: Optional[str] = LOAD_SCHEMA_CACHE,
+        on_drift: Literal["fail", "update"] = "fail",
+        csv_sep: str = ",",
+        local_path: Optional[str] = None,
+    ) -> Optional[Fields]:
+        """
+        Schema to pass to the load job for `table_id`, checked against the incoming file.
+          - expected = declared contract ({col: type} / [{"name","type"}]) or the one
+            cached for table_id on a previous run;
+          - incoming = Parquet footer (names + types) or CSV header (names only),
+            read with range requests, never the whole object (or from `local_path`
+            when the load comes from a local file).
+        First run without contract: Parquet caches its own schema; CSV returns None
+        (autodetect once) and `remember_table_schema` caches what BigQuery inferred.
+        On drift: "fail" raises ValueError with the diff before touching the table;
+        "update" accepts the new Parquet schema and replaces the cached one.
+        """
+        cached = None
+        if cache_path:
+            with LoadSchemaCache(cache_path) as cache:
+                cached = cache.get(table_id)
+        expected = normalize_fields(declared) if declared else (cached or {}).get("fields")
+
+        check_types = source_format == "PARQUET"
+        if local_path:
+            uris = [local_path]
+            sampled = [(local_path, local_fields(local_path, source_format, sep=csv_sep))]
+        else:
+            uris = uri_list(gcs_uri)
+            gcs = storage_client(self.credentials)
+            sampled = []
+            for uri in uris:
+                blob = sample_blob(gcs, uri)
+                if blob is None:
+                    raise FileNotFoundError(f"No object matches {uri}")
+                if source_format == "PARQUET":
+                    sampled.append((uri, parquet_fields(blob)))
+                else:
+                    names = csv_header(blob, sep=csv_sep)
+                    sampled.append((uri, [{"name": n, "type": "STRING", "mode": "NULLABLE"} for n in names]))
+        incoming = sampled[0][1]
+        # todos los archivos de un mismo load job tienen que coincidir entre sí
+        for uri, other in sampled[1:]:
+            diff = schema_diff(incoming, other, check_types=check_types)
+            if diff:
+                CustomLogger.emit(5, "load_schema", "PCBQ", table_id, "BIGQUERY", "True",
+                                  f"Schemas distintos entre {uris[0]} y {uri}: " + "; ".join(diff))
+                raise ValueError(f"Schema mismatch between {uris[0]} and {uri}:\n  " + "\n  ".join(diff))
+
+        if expected is None:
+            if source_format != "PARQUET":
+                return None
+            expected = incoming
+        diff = schema_diff(expected, incoming, check_types=check_types)
+        if diff:
+            if on_drift == "update" and source_format == "PARQUET":
+                CustomLogger.emit(5, "load_schema", "PCBQ", table_id, "BIGQUERY", "False",
+                                  "Schema actualizado: " + "; ".join(diff))
+                expected = incoming
+            else:
+                CustomLogger.emit(5, "load_schema", "PCBQ", table_id, "BIGQUERY", "True",
+                                  "Schema drift: " + "; ".join(diff))
+                raise ValueError(f"Schema drift for {table_id} ({', '.join(uris)}):\n  " + "\n  ".join(diff))
+
+        if source_format != "PARQUET":
+            # CSV: el schema explícito va en el orden de columnas del archivo
+            by_name = {f["name"].lower(): f for f in expected}
+            expected = [dict(by_name[f["name"].lower()], name=f["name"]) for f in incoming]
+
+        if cache_path and (cached is None or cached.get("fields") != expected):
+            with LoadSchemaCache(cache_path) as cache:
+                cache.put(table_id, source_format, expected)
+        return expected
+
+    def remember_table_schema(self, table_id: str, cache_path: Optional[str] = LOAD_SCHEMA_CACHE) -> Fields:
+        """Caches the current schema of `table_id` (e.g. after a first CSV autodetect load)."""
+        fields = normalize_fields(self.client.get_table(table_id).schema)
+        if cache_path:
+            with LoadSchemaCache(cache_path) as cache:
+                cache.put(table_id, "CSV", fields)
+        return fields
+
+    # ----------------------- partitioning / clustering -----------------------
+
+    def ensure_table_layout(
+        self,
+        table_id: str,
+        time_partitioning: Optional[PartitionSpec] = None,
+        clustering_fields: Optional[Sequence[str]] = None,
+        incoming: Optional[Fields] = None,
+        check_existing: bool = True,
+    ) -> None:
+        """
+        Fail-fast checks before loading with partitioning/clustering:
+          - against the incoming schema (if known): the partition column must exist
+            and be DATE/TIMESTAMP/DATETIME; clustering columns must exist;
+          - against the existing table (check_existing): partitioning cannot be
+            changed in place -> ValueError (use action=DROP); clustering can, so a
+            different clustering spec is updated on the table.
+        """
+        spec = to_time_partitioning(time_partitioning)
+        problems = []
+        if incoming is not None:
+            types = {f["name"].lower(): f["type"].upper() for f in incoming}
+            if spec is not None and spec.field:
+                t = types.get(spec.field.lower())
+                if t is None:
+                    problems.append(f"partition column {spec.field!r} not in the file")
+                elif t not in _PARTITION_FIELD_TYPES:
+                    problems.append(f"partition column {spec.field!r} is {t}; needs DATE/TIMESTAMP/DATETIME")
+            missing = [c for c in clustering_fields or [] if c.lower() not in types]
+            if missing:
+                problems.append(f"clustering columns not in the file: {missing}")
+
+        table = None
+        if check_existing and not problems:
+            try:
+                table = self.client.get_table(table_id)
+            except NotFound:
+                table = None
+        if table is not None:
+            current = table.time_partitioning
+            cur = (current.type_, current.field) if current else None
+            new = (spec.type_, spec.field) if spec else None
+            if spec is not None and cur != new:
+                problems.append(f"existing partitioning {cur} != requested {new}; recreate the table (action=DROP)")
+            if clustering_fields and list(table.clustering_fields or []) != list(clustering_fields):
+                table.clustering_fields = list(clustering_fields)
+                self.client.update_table(table, ["clustering_fields"])
+                CustomLogger.emit(5, "table_layout", "PCBQ", table_id, "BIGQUERY", "False",
+                                  f"Clustering actualizado: {list(clustering_fields)}")
+
+        if problems:
+            CustomLogger.emit(5, "table_layout", "PCBQ", table_id, "BIGQUERY", "True", "; ".join(problems))
+            raise ValueError(f"Table layout check failed for {table_id}: " + "; ".join(problems))
@@ -0,0 +1,71 @@
+# /opt/airflow/plugins/utils/bq_telemetry.py
+from __future__ import annotations
+
+from typing import Any, Dict, Optional
+
+
+def _seconds(a, b) -> Optional[float]:
+    return round((b - a).total_seconds(), 3) if a and b else None
+
+
+def _int(v) -> Optional[int]:
+    return int(v) if v not in (None, "") else None
+
+
+def _raw_stat(job, *path) -> Any:
+    """Campo del recurso crudo del job, para lo que la clase no expone como propiedad."""
+    node = getattr(job, "_properties", None) or {}
+    for key in ("statistics",) + path:
+        node = node.get(key) if isinstance(node, dict) else None
+    return node
+
+
+def job_stats(job, label: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Estadísticas de un job de BigQuery terminado (query, load, copy o script),
+    en un dict plano y serializable (XCom / JSON). Usa las propiedades públicas
+    de cada clase de job; sólo lo que no tiene propiedad (filas copiadas de un
+    copy, slot ms fuera de un query) se lee del recurso crudo.
+    """
+    # 0 es un conteo válido (p.ej. carga INSERT_INTO vacía): sólo None cae al siguiente
+    output_rows = _int(getattr(job, "output_rows", None))
+    if output_rows is None and getattr(job, "job_type", None) == "copy":
+        output_rows = _int(_raw_stat(job, "copy", "copiedRows"))
+    if output_rows is None:
+        output_rows = _int(getattr(job, "num_dml_affected_rows", None))
+
+    slot_ms = _int(getattr(job, "slot_millis", None))
+    if slot_ms is None:
+        slot_ms = _int(_raw_stat(job, "totalSlotMs"))
+
+    created, started, ended = (getattr(job, a, None) for a in ("created", "started", "ended"))
+    return {
+        "label": label,
+        "job_id": getattr(job, "job_id", None),
+        "job_type": getattr(job, "job_type", None),
+        "statement_type": getattr(job, "statement_type", None),
+        "location": getattr(job, "location", None),
+        "bytes_processed": _int(getattr(job, "total_bytes_processed", None)),
+        "bytes_billed": _int(getattr(job, "total_bytes_billed", None)),
+        "input_bytes": _int(getattr(job, "input_file_bytes", None)),
+        "slot_ms": slot_ms,
+        "queue_s": _seconds(created, started),
+        "exec_s": _seconds(started, ended),
+        "cache_hit": getattr(job, "cache_hit", None),
+        "output_rows": output_rows,
+    }
+
+
+def _mib(v: Optional[int]) -> str:
+    return f"{v / 2**20:.1f} MiB" if v is not None else "-"
+
+
+def summary(stats: Dict[str, Any]) -> str:
+    """Una línea legible para el log de la tarea."""
+    return (
+        f"{stats.get('job_type') or 'job'} {stats.get('job_id')}: "
+        f"cola {stats.get('queue_s')} s, ejecución {stats.get('exec_s')} s, "
+        f"slot_ms {stats.get('slot_ms')}, procesado {_mib(stats.get('bytes_processed'))}, "
+        f"facturado {_mib(stats.get('bytes_billed'))}, cache {stats.get('cache_hit')}, "
+        f"filas {stats.get('output_rows')}"
+    )
@@ -0,0 +1,149 @@
+# /opt/airflow/plugins/utils/checksums.py
+from __future__ import annotations
+
+import base64
+import hashlib
+import json
+import os
+from typing import Dict, Optional
+
+try:
+    import google_crc32c  # viene con google-cloud-storage
+except ImportError:  # pragma: no cover
+    google_crc32c = None
+
+# Sidecars con los hashes de archivos locales: {ruta, size, mtime_ns, md5, crc32c}
+CHECKSUM_CACHE_DIR = os.path.join(os.getenv("AIRFLOW_HOME", "/opt/airflow"), "data", "cache", "checksums")
+
+_READ_BLOCK = 8 << 20
+
+
+def _b64(raw: bytes) -> str:
+    return base64.b64encode(raw).decode("ascii")
+
+
+class _Digester:
+    """MD5 + CRC32C incrementales, en el mismo formato base64 que exponen los blobs de GCS."""
+
+    def __init__(self):
+        self._md5 = hashlib.md5()
+        self._crc = google_crc32c.Checksum() if google_crc32c is not None else None
+
+    def update(self, data) -> None:
+        self._md5.update(data)
+        if self._crc is not None:
+            self._crc.update(bytes(data))
+
+    def digests(self) -> Dict[str, Optional[str]]:
+        return {
+            "md5": _b64(self._md5.digest()),
+            "crc32c": _b64(self._crc.digest()) if self._crc is not None else None,
+        }
+
+
+class HashingFile:
+    """
+    Archivo de escritura que calcula MD5/CRC32C sobre los bytes a medida que
+    se escriben. Sirve de sink para pq.ParquetWriter (escribe secuencial, sin
+    seek), así el hash sale gratis al terminar el Parquet, sin releerlo.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fh = open(path, "wb")
+        self._digester = _Digester()
+        self._pos = 0
+
+    def write(self, data) -> int:
+        self._fh.write(data)
+        self._digester.update(data)
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def flush(self) -> None:
+        self._fh.flush()
+
+    @property
+    def closed(self) -> bool:
+        return self._fh.closed
+
+    def close(self) -> None:
+        self._fh.close()
+
+    def digests(self) -> Dict[str, Optional[str]]:
+        return self._digester.digests()
+
+    def __enter__(self) -> "HashingFile":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def file_digests(path: str) -> Dict[str, Optional[str]]:
+    """Hashes de un archivo ya escrito (una lectura secuencial por bloques)."""
+    digester = _Digester()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(_READ_BLOCK), b""):
+            digester.update(block)
+    return digester.digests()
+
+
+def _sidecar(path: str, cache_dir: str) -> str:
+    key = hashlib.sha1(os.path.realpath(path).encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir, f"{key}.json")
+
+
+def remember(path: str, digests: Dict[str, Optional[str]], cache_dir: str = CHECKSUM_CACHE_DIR) -> None:
+    """Guarda los hashes de `path` junto con su size/mtime para reutilizarlos en otra tarea."""
+    try:
+        st = os.stat(path)
+        os.makedirs(cache_dir, exist_ok=True)
+        sidecar = _sidecar(path, cache_dir)
+        tmp = f"{sidecar}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump({"path": os.path.realpath(path), "size": st.st_size,
+                       "mtime_ns": st.st_mtime_ns, **digests}, fh)
+        os.replace(tmp, sidecar)
+    except OSError:
+        pass  # el cache es opcional: sin él se recalcula leyendo el archivo
+
+
+def cached_digests(path: str, cache_dir: str = CHECKSUM_CACHE_DIR) -> Optional[Dict[str, Optional[str]]]:
+    """Hashes guardados por `remember` si el archivo no cambió (mismo size y mtime); si no, None."""
+    try:
+        st = os.stat(path)
+        with open(_sidecar(path, cache_dir), "r", encoding="utf-8") as fh:
+            data = json.load(fh)
+    except (OSError, ValueError):
+        return None
+    if data.get("size") != st.st_size or data.get("mtime_ns") != st.st_mtime_ns:
+        return None
+    return {"md5": data.get("md5"), "crc32c": data.get("crc32c")}
+
+
+def digests_for(path: str, cache_dir: str = CHECKSUM_CACHE_DIR) -> Dict[str, Optional[str]]:
+    """Hashes de `path`: del sidecar si sigue vigente, o leyendo el archivo (y se guardan)."""
+    cached = cached_digests(path, cache_dir)
+    if cached is not None:
+        return cached
+    digests = file_digests(path)
+    remember(path, digests, cache_dir)
+    return digests
+
+
+def blob_matches(blob, digests: Dict[str, Optional[str]]) -> bool:
+    """
+    True si el blob (ya recargado) tiene el mismo contenido: compara MD5 y,
+    si el blob no lo tiene (objetos compuestos), CRC32C.
+    """
+    if blob is None or not digests:
+        return False
+    if blob.md5_hash and digests.get("md5"):
+        return blob.md5_hash == digests["md5"]
+    if blob.crc32c and digests.get("crc32c"):
+        return blob.crc32c == digests["crc32c"]
+    return False
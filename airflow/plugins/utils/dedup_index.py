@@ -0,0 +1,127 @@
+# /opt/airflow/plugins/utils/dedup_index.py
+from __future__ import annotations
+
+import os
+import sqlite3
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+
+class UniqueIdIndex:
+    """
+    Índice persistente (SQLite) de los `uniqueid` ya emitidos por el merge en
+    corridas anteriores. Cada id guarda la corrida (`run_key`) que lo emitió:
+    los ids de la misma corrida no cuentan como repetidos, así un retry de la
+    tarea produce la misma salida.
+
+    Los ids que agrega el merge quedan pendientes: sólo cuentan como emitidos
+    cuando `commit_run(path, run_key)` los confirma, después de que la carga a
+    BigQuery de esa corrida terminó bien. Si la carga falla, la corrida
+    siguiente vuelve a emitirlos (y se los queda como pendientes suyos).
+
+    Uso:
+        with UniqueIdIndex(path, run_key, retention_days=30) as idx:
+            mask = idx.seen_mask(df['uniqueid'])
+            ...
+            idx.add(emitidos)
+        ...  # carga downstream
+        UniqueIdIndex.commit_run(path, run_key)
+    Los ids nuevos se guardan sólo si el bloque `with` termina sin error.
+    """
+
+    def __init__(self, path: str, run_key: str, retention_days: int = 30):
+        self.path = path
+        self.run_key = run_key
+        self.retention_days = int(retention_days)
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=300)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS seen_uniqueid ("
+            " uniqueid TEXT PRIMARY KEY,"
+            " run_key TEXT NOT NULL,"
+            " first_seen TEXT NOT NULL,"
+            " committed INTEGER NOT NULL DEFAULT 0"
+            ") WITHOUT ROWID"
+        )
+        columns = {r[1] for r in self.conn.execute("PRAGMA table_info(seen_uniqueid)")}
+        if "committed" not in columns:
+            # índices creados antes de los pendientes: lo ya registrado se considera confirmado
+            self.conn.execute("ALTER TABLE seen_uniqueid ADD COLUMN committed INTEGER NOT NULL DEFAULT 1")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS ix_seen_first_seen ON seen_uniqueid(first_seen)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS ix_seen_run_key ON seen_uniqueid(run_key, committed)")
+        self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS _probe (uniqueid TEXT PRIMARY KEY) WITHOUT ROWID")
+        self.conn.commit()
+
+    def seen_mask(self, ids: pd.Series) -> np.ndarray:
+        """True para las filas cuyo uniqueid ya fue emitido (y confirmado) por otra corrida."""
+        uniq = pd.unique(ids.dropna().astype(str))
+        if len(uniq) == 0:
+            return np.zeros(len(ids), dtype=bool)
+        self.conn.execute("DELETE FROM _probe")
+        self.conn.executemany("INSERT OR IGNORE INTO _probe(uniqueid) VALUES (?)", ((u,) for u in uniq))
+        seen = {
+            r[0] for r in self.conn.execute(
+                "SELECT p.uniqueid FROM _probe p JOIN seen_uniqueid s ON s.uniqueid = p.uniqueid "
+                "WHERE s.committed = 1 AND s.run_key <> ?",
+                (self.run_key,),
+            )
+        }
+        if not seen:
+            return np.zeros(len(ids), dtype=bool)
+        return ids.isin(seen).to_numpy()
+
+    def add(self, ids: pd.Series) -> None:
+        """Registra como pendientes de esta corrida los uniqueid de `ids` (los pendientes ajenos pasan a ésta)."""
+        today = datetime.now().strftime("%Y-%m-%d")
+        self.conn.executemany(
+            "INSERT INTO seen_uniqueid(uniqueid, run_key, first_seen, committed) VALUES (?, ?, ?, 0)"
+            " ON CONFLICT(uniqueid) DO UPDATE SET run_key = excluded.run_key, first_seen = excluded.first_seen"
+            " WHERE committed = 0",
+            ((str(u), self.run_key, today) for u in pd.unique(ids.dropna())),
+        )
+
+    @staticmethod
+    def commit_run(path: str, run_key: str) -> int:
+        """Confirma los ids pendientes de `run_key` (su carga terminó bien). Devuelve cuántos."""
+        if not os.path.exists(path):
+            return 0
+        conn = sqlite3.connect(path, timeout=300)
+        try:
+            with conn:
+                cur = conn.execute(
+                    "UPDATE seen_uniqueid SET committed = 1 WHERE run_key = ? AND committed = 0", (str(run_key),)
+                )
+            return cur.rowcount
+        finally:
+            conn.close()
+
+    def prune(self) -> int:
+        """Borra ids más viejos que `retention_days`. Devuelve cuántos eliminó."""
+        if self.retention_days <= 0:
+            return 0
+        cutoff = (datetime.now() - timedelta(days=self.retention_days)).strftime("%Y-%m-%d")
+        cur = self.conn.execute("DELETE FROM seen_uniqueid WHERE first_seen < ?", (cutoff,))
+        return cur.rowcount
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM seen_uniqueid").fetchone()[0]
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "UniqueIdIndex":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.conn.commit()
+            else:
+                self.conn.rollback()
+        finally:
+            self.close()
@@ -0,0 +1,94 @@
+# /opt/airflow/plugins/utils/file_discovery.py
+from __future__ import annotations
+
+import os
+import re
+from typing import Iterable, List, Optional, Tuple, Union
+
+
+def _compile_globs(patterns: Iterable[str], ignore_case: bool) -> List[re.Pattern]:
+    """Convierte patrones con * y ? a regex anclados."""
+    flags = re.IGNORECASE if ignore_case else 0
+    regexes = []
+    for pat in patterns:
+        pat = (pat or "").strip()
+        if not pat:
+            continue
+        rx = '^' + re.escape(pat).replace(r'\*', '.*').replace(r'\?', '.') + '$'
+        regexes.append(re.compile(rx, flags=flags))
+    return regexes
+
+
+def discover_files(
+    base: str,
+    globs: Union[str, Iterable[str], None] = None,
+    *,
+    substrings: Union[str, Iterable[str], None] = None,
+    recursive: bool = False,
+    ignore_case: bool = True,
+) -> List[Tuple[str, float]]:
+    """
+    Una sola pasada con os.scandir sobre `base` (y subcarpetas si `recursive`).
+    Un archivo califica si su nombre matchea algún glob (* y ?) o contiene
+    algún substring; sin patrones califican todos. Sólo se hace stat de los
+    que califican, reutilizando el del DirEntry.
+
+    Devuelve [(ruta, mtime)] ordenado por mtime desc (el más reciente primero).
+    Si `base` no existe devuelve [].
+    """
+    if isinstance(globs, str):
+        globs = [globs]
+    if isinstance(substrings, str):
+        substrings = [substrings]
+    regexes = _compile_globs(globs or [], ignore_case)
+    subs = [s for s in (substrings or []) if s]
+    if ignore_case:
+        subs = [s.lower() for s in subs]
+    match_all = not regexes and not subs
+
+    hits: List[Tuple[str, float]] = []
+    stack = [base]
+    while stack:
+        folder = stack.pop()
+        try:
+            it = os.scandir(folder)
+        except (FileNotFoundError, NotADirectoryError, PermissionError):
+            continue
+        with it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if recursive:
+                            stack.append(entry.path)
+                        continue
+                    if not entry.is_file():
+                        continue
+                except OSError:
+                    continue
+
+                name = entry.name
+                if not match_all:
+                    key = name.lower() if ignore_case else name
+                    if not (any(s in key for s in subs) or any(rx.match(name) for rx in regexes)):
+                        continue
+                try:
+                    hits.append((entry.path, entry.stat().st_mtime))
+                except OSError:
+                    # desapareció entre el scandir y el stat
+                    continue
+
+    hits.sort(key=lambda t: t[1], reverse=True)
+    return hits
+
+
+def latest_file(
+    base: str,
+    globs: Union[str, Iterable[str], None] = None,
+    *,
+    substrings: Union[str, Iterable[str], None] = None,
+    recursive: bool = False,
+    ignore_case: bool = True,
+) -> Tuple[Optional[str], float]:
+    """(ruta, mtime) del archivo más reciente que califica, o (None, 0.0)."""
+    hits = discover_files(base, globs, substrings=substrings, recursive=recursive, ignore_case=ignore_case)
+    return hits[0] if hits else (None, 0.0)
@@ -0,0 +1,79 @@
+# /opt/airflow/plugins/utils/gcp_clients.py
+from __future__ import annotations
+
+import os
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from google.auth.transport.requests import AuthorizedSession
+from google.cloud import bigquery, storage
+from google.oauth2 import service_account
+from requests.adapters import HTTPAdapter
+
+SCOPES = ("https://www.googleapis.com/auth/cloud-platform",)
+# Conexiones HTTP por host en el pool compartido (cubre los workers de upload paralelo)
+POOL_SIZE = 32
+
+_lock = threading.Lock()
+_clients: Dict[Tuple[str, Optional[str], Optional[str]], Any] = {}
+_pid = os.getpid()
+
+
+def _check_fork() -> None:
+    """Un proceso hijo (fork del task runner) no debe reutilizar los sockets del padre."""
+    global _pid
+    if os.getpid() != _pid:
+        _clients.clear()
+        _pid = os.getpid()
+
+
+def _key(kind: str, credentials: Optional[str], project: Optional[str]):
+    path = os.path.realpath(credentials) if credentials else None
+    mtime = os.path.getmtime(path) if path and os.path.exists(path) else None
+    # el mtime en la clave hace que una key rotada genere un cliente nuevo
+    return kind, f"{path}@{mtime}" if path else None, project
+
+
+def _session(creds) -> AuthorizedSession:
+    session = AuthorizedSession(creds)
+    adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def _get(kind: str, credentials: Optional[str], project: Optional[str], build: Callable[..., Any]):
+    with _lock:
+        _check_fork()
+        key = _key(kind, credentials, project)
+        client = _clients.get(key)
+        if client is None:
+            if credentials:
+                creds = service_account.Credentials.from_service_account_file(credentials, scopes=SCOPES)
+                client = build(project=project or creds.project_id, credentials=creds, _http=_session(creds))
+            else:
+                # Sin key explícita: Application Default Credentials, sin tocar el entorno
+                client = build(project=project)
+            _clients[key] = client
+        return client
+
+
+def storage_client(credentials: Optional[str] = None, project: Optional[str] = None) -> storage.Client:
+    """Cliente de GCS compartido en el proceso para (credentials, project)."""
+    return _get("storage", credentials, project, storage.Client)
+
+
+def bigquery_client(credentials: Optional[str] = None, project: Optional[str] = None) -> bigquery.Client:
+    """Cliente de BigQuery compartido en el proceso para (credentials, project)."""
+    return _get("bigquery", credentials, project, bigquery.Client)
+
+
+def reset() -> None:
+    """Cierra y olvida todos los clientes (tests / rotación forzada de credenciales)."""
+    with _lock:
+        for client in _clients.values():
+            try:
+                client.close()
+            except Exception:
+                pass
+        _clients.clear()
@@ -1,72 +1,176 @@
 from __future__ import annotations
 import os
 import tempfile
+import time
 from datetime import datetime
-from typing import Tuple
+from typing import Dict, Optional, Tuple
 
-import pandas as pd  # NEW (needs pyarrow installed)
 from google.cloud import storage
 from utils.custom_logger import CustomLogger
+from utils.tabular_io import csv_to_parquet, is_parquet
+from utils.file_discovery import latest_file
+from utils.gcs_transfer import LargeFileUploader, MiB
+from utils.checksums import blob_matches, digests_for
+from utils.gcp_clients import storage_client
 
 class GCSService:
-    def __init__(self, bucket: str, credentials: str | None = None):
-        if credentials:
-            os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = credentials
-        self.client = storage.Client()
+    def __init__(
+        self,
+        bucket: str,
+        credentials: str | None = None,
+        large_file_threshold_mb: float | None = 256,
+        chunk_size_mb: int = 32,
+        upload_workers: int = 8,
+    ):
+        # Shared per worker process; credentials are loaded explicitly (no env mutation)
+        self.client = storage_client(credentials)
         self.bucket = self.client.bucket(bucket)
+        # Files >= threshold go through LargeFileUploader (parallel composite + resumable)
+        self.large_file_threshold = int(large_file_threshold_mb * MiB) if large_file_threshold_mb else None
+        self.chunk_size = int(chunk_size_mb * MiB)
+        self.upload_workers = upload_workers
+        # Detail of the last upload_raw_and_backup call (paths, hashes, what was skipped)
+        self.last_result: Dict[str, object] = {}
+
+    def _upload_file(self, blob: storage.Blob, path: str) -> None:
+        size = os.path.getsize(path)
+        t0 = time.monotonic()
+        if self.large_file_threshold is not None and size >= self.large_file_threshold:
+            stats = LargeFileUploader(self.client, self.chunk_size, self.upload_workers).upload(path, blob)
+            mode = f"parallel composite, {stats['parts']} parts, {self.upload_workers} workers"
+        else:
+            blob.upload_from_filename(path)
+            mode = "single stream"
+        elapsed = max(time.monotonic() - t0, 1e-6)
+        CustomLogger.emit(
+            4, "upload_to_gcs", "PCGCS", blob.name, "GCS", "False",
+            f"Upload {size / MiB:.1f} MB en {elapsed:.1f} s ({size / MiB / elapsed:.1f} MB/s, {mode})",
+        )
+
+    def upload_file(self, path: str, object_name: str) -> str:
+        """Uploads a local file as-is to gs://<bucket>/<object_name>. Returns the URI."""
+        self._upload_file(self.bucket.blob(object_name), path)
+        return f"gs://{self.bucket.name}/{object_name}"
 
     def _find_latest(self, local_dir: str, input_pattern: str) -> Tuple[str, float]:
-        latest_file, latest_mtime = None, 0.0
-        for root, _, files in os.walk(local_dir):
-            for f in files:
-                if input_pattern in f:
-                    p = os.path.join(root, f)
-                    m = os.path.getmtime(p)
-                    if m > latest_mtime:
-                        latest_mtime, latest_file = m, p
-        return latest_file, latest_mtime
+        # Newest file (recursive) whose name contains input_pattern; stat only on matches
+        return latest_file(local_dir, substrings=input_pattern, recursive=True, ignore_case=False)
 
-    def _to_parquet(self, src_path: str) -> str:
+    def _to_parquet(
+        self,
+        src_path: str,
+        csv_options: Optional[dict] = None,
+        row_group_size: int = 128_000,
+        compression: str = "snappy",
+    ) -> Tuple[str, Dict[str, Optional[str]]]:
         """
         Reads CSV *or* Parquet and writes a cleaned Parquet to a temp path.
-        - If input is already parquet, just copy to temp parquet path.
+        Returns (parquet_path, {"md5", "crc32c"}) with base64 digests as GCS reports them.
+        - If input is already parquet (e.g. MergeProcessOperator output_format="parquet"),
+          it is returned as-is: no copy, no re-read, dtypes preserved. Its digests come
+          from the checksum cache written by the merge, or from one sequential read.
+        - CSV is converted in streaming (Arrow reader -> ParquetWriter), one row group
+          at a time, hashing the bytes as they are written.
+          csv_options: {"sep": ";", "encoding": "latin-1", "dtypes": {...}, "header": 0}
         """
-        _, ext = os.path.splitext(src_path.lower())
+        if is_parquet(src_path):
+            return src_path, digests_for(src_path)
+
         tmpdir = tempfile.mkdtemp(prefix="gcs_parquet_")
         out_path = os.path.join(tmpdir, "payload.parquet")
 
-        if ext == ".parquet":
-            # Just copy as-is to temp parquet
-            import shutil
-            shutil.copy2(src_path, out_path)
-            return out_path
+        opts = dict(csv_options or {})
+        digests: Dict[str, Optional[str]] = {}
+        csv_to_parquet(
+            src_path,
+            out_path,
+            sep=opts.get("sep") or ",",
+            encoding=opts.get("encoding") or "utf-8",
+            dtypes=opts.get("dtypes"),
+            header=int(opts.get("header", 0)),
+            row_group_size=row_group_size,
+            compression=compression,
+            stats=digests,
+        )
+        return out_path, digests
 
-        # Assume CSV otherwise; tweak read_csv args to your real CSV shape
-        df = pd.read_csv(src_path)  # add sep=";" / encoding / dtype as needed
-        # Write with pyarrow
-        df.to_parquet(out_path, index=False)
-        return out_path
+    @staticmethod
+    def _server_side_copy(src_blob: storage.Blob, dst_blob: storage.Blob) -> None:
+        """
+        Copies src -> dst inside GCS (rewrite API): no bytes go through the worker.
+        Large objects may need several rewrite calls; loop until the token is None.
+        """
+        token, _, _ = dst_blob.rewrite(src_blob)
+        while token is not None:
+            token, _, _ = dst_blob.rewrite(src_blob, token=token)
 
-    def upload_raw_and_backup(self, local_dir: str, input_pattern: str, output_basename: str) -> str:
+    def upload_raw_and_backup(
+        self,
+        local_dir: str,
+        input_pattern: str,
+        output_basename: str,
+        csv_options: Optional[dict] = None,
+        row_group_size: int = 128_000,
+        compression: str = "snappy",
+        backup_mode: str = "copy",
+        skip_unchanged: bool = True,
+    ) -> str:
         """
         NEW: Converts the latest matching file to Parquet and uploads:
           - raw/RAW_<basename>.parquet
           - backup/<basename>_YYYY-MM-DD.parquet
-        Returns the local *parquet* path that was uploaded.
+        backup_mode="copy" (default) uploads once and creates the backup with a
+        server-side rewrite of the raw object; "upload" uploads the file twice (legacy).
+        skip_unchanged=True compares the local MD5 (CRC32C for composite objects) with
+        the remote object metadata and skips the upload/copy when the content is identical.
+        Returns the local *parquet* path that was uploaded; details are left in `last_result`.
         """
+        if backup_mode not in ("copy", "upload"):
+            raise ValueError("backup_mode must be 'copy' or 'upload'")
         latest_file, _ = self._find_latest(local_dir, input_pattern)
         if not latest_file:
             CustomLogger.emit(4, "upload_to_gcs", "PCGCS", input_pattern, "GCS", "True", "No matching file")
             raise FileNotFoundError("No matching file")
 
-        parquet_path = self._to_parquet(latest_file)
+        parquet_path, digests = self._to_parquet(latest_file, csv_options, row_group_size, compression)
         today = datetime.now().strftime("%Y-%m-%d")
 
-        raw_blob = self.bucket.blob(f"raw/RAW_{output_basename}.parquet")
-        raw_blob.upload_from_filename(parquet_path)
+        raw_name = f"raw/RAW_{output_basename}.parquet"
+        raw_skipped = skip_unchanged and blob_matches(self.bucket.get_blob(raw_name), digests)
+        raw_blob = self.bucket.blob(raw_name)
+        if raw_skipped:
+            CustomLogger.emit(
+                4, "upload_to_gcs", "PCGCS", raw_name, "GCS", "False",
+                f"Sin cambios (md5 {digests.get('md5')}): se omite el upload",
+            )
+        else:
+            self._upload_file(raw_blob, parquet_path)
 
-        bkp_blob = self.bucket.blob(f"backup/{output_basename}_{today}.parquet")
-        bkp_blob.upload_from_filename(parquet_path)
+        bkp_name = f"backup/{output_basename}_{today}.parquet"
+        bkp_skipped = skip_unchanged and blob_matches(self.bucket.get_blob(bkp_name), digests)
+        bkp_blob = self.bucket.blob(bkp_name)
+        if bkp_skipped:
+            CustomLogger.emit(
+                4, "upload_to_gcs", "PCGCS", bkp_name, "GCS", "False",
+                "Backup del día ya existe con el mismo contenido: se omite",
+            )
+        elif backup_mode == "copy":
+            self._server_side_copy(raw_blob, bkp_blob)
+        else:
+            self._upload_file(bkp_blob, parquet_path)
 
-        CustomLogger.emit(4, "upload_to_gcs", "PCGCS", parquet_path, "GCS", "False", "RAW+BACKUP Parquet subidos")
+        self.last_result = {
+            "parquet_path": parquet_path,
+            "raw_uri": f"gs://{self.bucket.name}/{raw_name}",
+            "backup_uri": f"gs://{self.bucket.name}/{bkp_name}",
+            "md5": digests.get("md5"),
+            "crc32c": digests.get("crc32c"),
+            "raw_skipped": bool(raw_skipped),
+            "backup_skipped": bool(bkp_skipped),
+        }
+        CustomLogger.emit(
+            4, "upload_to_gcs", "PCGCS", parquet_path, "GCS", "False",
+            f"RAW+BACKUP Parquet subidos (backup: {backup_mode}, "
+            f"raw omitido: {bool(raw_skipped)}, backup omitido: {bool(bkp_skipped)})",
+        )
         return parquet_path
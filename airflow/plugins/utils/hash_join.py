@@ -0,0 +1,53 @@
+# /opt/airflow/plugins/utils/hash_join.py
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+
+class HashJoinIndex:
+    """
+    Índice hash sobre el lado "build" (el más chico) de un inner join.
+    Se construye una sola vez y luego se le pasan bloques del lado grande
+    con `join(chunk)`; el resultado tiene el mismo layout que
+    `chunk.merge(build, on=on, how='inner')` (sufijos _x/_y incluidos).
+    """
+
+    def __init__(self, build: pd.DataFrame, on: str, suffixes=("_x", "_y")):
+        self.on = on
+        self.suffixes = suffixes
+        self.build = build.reset_index(drop=True)
+
+        codes, uniques = pd.factorize(self.build[on])
+        valid = codes >= 0
+        # posiciones del build agrupadas por clave, respetando el orden original
+        order = np.argsort(codes, kind="stable")
+        self._order = order[valid[order]]
+        self._counts = np.bincount(codes[valid], minlength=len(uniques))
+        self._starts = np.concatenate(([0], np.cumsum(self._counts)[:-1])).astype(np.int64)
+        self._keys = pd.Index(uniques)
+        self._build_cols = [c for c in self.build.columns if c != on]
+
+    def __len__(self) -> int:
+        return len(self.build)
+
+    def join(self, probe: pd.DataFrame) -> pd.DataFrame:
+        on = self.on
+        k = self._keys.get_indexer(probe[on])
+        hit = np.flatnonzero(k >= 0)
+        kk = k[hit]
+        counts = self._counts[kk]
+        total = int(counts.sum())
+
+        probe_pos = np.repeat(hit, counts)
+        offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        build_pos = self._order[np.repeat(self._starts[kk], counts) + offsets]
+
+        left = probe.iloc[probe_pos].reset_index(drop=True)
+        right = self.build[self._build_cols].iloc[build_pos].reset_index(drop=True)
+
+        overlap = (set(left.columns) & set(right.columns)) - {on}
+        if overlap:
+            left = left.rename(columns={c: f"{c}{self.suffixes[0]}" for c in overlap})
+            right = right.rename(columns={c: f"{c}{self.suffixes[1]}" for c in overlap})
+        return pd.concat([left, right], axis=1)
@@ -0,0 +1,150 @@
+# /opt/airflow/plugins/utils/load_ledger.py
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Union
+
+from google.cloud import storage
+from utils.checksums import digests_for
+from utils.load_schema import matching_blobs, uri_list
+
+LOAD_LEDGER_PATH = os.path.join(os.getenv("AIRFLOW_HOME", "/opt/airflow"), "data", "cache", "bq_load_ledger.sqlite")
+
+# [{"uri", "generation", "md5"}] ordenado por uri: identifica el contenido exacto de una carga
+Sources = List[Dict[str, str]]
+
+
+def source_fingerprint(
+    client: Optional[storage.Client],
+    gcs_uri: Union[str, Sequence[str], None] = None,
+    local_path: Optional[str] = None,
+) -> Optional[Sources]:
+    """
+    Versión exacta de la fuente de un load: por objeto GCS (comodines expandidos)
+    su generation y MD5 (CRC32C en objetos compuestos, que no tienen MD5); para un
+    archivo local, mtime_ns y MD5. Sólo metadata, sin descargar nada.
+    None si algún URI no matchea nada (no hay con qué comparar; el load decide).
+    """
+    if local_path:
+        if not os.path.isfile(local_path):
+            return None
+        digests = digests_for(local_path)
+        return [{
+            "uri": os.path.realpath(local_path),
+            "generation": str(os.stat(local_path).st_mtime_ns),
+            "md5": digests.get("md5") or f"crc32c:{digests.get('crc32c')}",
+        }]
+    sources: Sources = []
+    for uri in uri_list(gcs_uri or []):
+        blobs = matching_blobs(client, uri)
+        if not blobs:
+            return None
+        sources += [{
+            "uri": f"gs://{b.bucket.name}/{b.name}",
+            "generation": str(b.generation),
+            "md5": b.md5_hash or f"crc32c:{b.crc32c}",
+        } for b in blobs]
+    return sorted({s["uri"]: s for s in sources}.values(), key=lambda s: s["uri"])
+
+
+def _settings_json(settings: Optional[dict]) -> str:
+    return json.dumps(settings, sort_keys=True, default=str)
+
+
+class LoadLedger:
+    """
+    Registro persistente (SQLite) de la última carga exitosa de cada tabla:
+    qué versión de la fuente se cargó (uri + generation + md5), con qué
+    parámetros (acción, formato, schema, layout) y cuántas filas quedaron en la
+    tabla. Si una corrida vuelve a cargar exactamente la misma fuente con los
+    mismos parámetros y la tabla sigue con esas filas, la carga se puede omitir.
+
+    Uso:
+        with LoadLedger(path) as ledger:
+            if ledger.unchanged(table_id, sources, current_rows, settings):
+                ...
+            ledger.record(table_id, sources, rows, settings, job_id)
+    Lo registrado se confirma sólo si el bloque `with` termina sin error.
+    """
+
+    def __init__(self, path: str = LOAD_LEDGER_PATH):
+        self.path = path
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=300)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS bq_loads ("
+            " table_id TEXT PRIMARY KEY,"
+            " gcs_uri TEXT NOT NULL,"
+            " generation TEXT NOT NULL,"
+            " md5 TEXT NOT NULL,"
+            " sources TEXT NOT NULL,"
+            " rows INTEGER,"
+            " settings TEXT,"
+            " job_id TEXT,"
+            " loaded_at TEXT NOT NULL"
+            ") WITHOUT ROWID"
+        )
+        self.conn.commit()
+
+    def get(self, table_id: str) -> Optional[dict]:
+        row = self.conn.execute(
+            "SELECT sources, rows, settings, job_id, loaded_at FROM bq_loads WHERE table_id = ?", (table_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {"sources": json.loads(row[0]), "rows": row[1], "settings": json.loads(row[2] or "null"),
+                "job_id": row[3], "loaded_at": row[4]}
+
+    def unchanged(self, table_id: str, sources: Optional[Sources], current_rows: Optional[int],
+                  settings: Optional[dict] = None) -> Optional[dict]:
+        """La entrada registrada si fuente y parámetros son los mismos y la tabla conserva sus filas; si no, None."""
+        entry = self.get(table_id)
+        if entry is None or not sources or current_rows is None:
+            return None
+        if entry["sources"] != sources or entry["rows"] != current_rows or entry["settings"] != json.loads(_settings_json(settings)):
+            return None
+        return entry
+
+    def record(self, table_id: str, sources: Sources, rows: Optional[int],
+               settings: Optional[dict] = None, job_id: Optional[str] = None) -> None:
+        """Registra (reemplaza) la última carga exitosa de `table_id`."""
+        self.conn.execute(
+            "INSERT OR REPLACE INTO bq_loads"
+            "(table_id, gcs_uri, generation, md5, sources, rows, settings, job_id, loaded_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                table_id,
+                ",".join(s["uri"] for s in sources),
+                ",".join(s["generation"] for s in sources),
+                ",".join(s["md5"] for s in sources),
+                json.dumps(sources),
+                rows,
+                _settings_json(settings),
+                job_id,
+                datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            ),
+        )
+
+    def forget(self, table_id: str) -> None:
+        self.conn.execute("DELETE FROM bq_loads WHERE table_id = ?", (table_id,))
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "LoadLedger":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.conn.commit()
+            else:
+                self.conn.rollback()
+        finally:
+            self.close()
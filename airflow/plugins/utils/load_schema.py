@@ -0,0 +1,145 @@
+# /opt/airflow/plugins/utils/load_schema.py
+from __future__ import annotations
+
+import csv
+import fnmatch
+import io
+import struct
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from google.cloud import bigquery, storage
+
+# [{"name": ..., "type": ..., "mode": ...}] — forma serializable (JSON) de un schema de BigQuery
+Fields = List[Dict[str, str]]
+
+_FOOTER_PROBE = 64 * 1024   # casi siempre alcanza para el footer de un Parquet
+_CSV_PROBE = 64 * 1024
+
+
+def arrow_to_bq_type(t: pa.DataType) -> str:
+    if pa.types.is_dictionary(t):
+        return arrow_to_bq_type(t.value_type)
+    if pa.types.is_boolean(t):
+        return "BOOLEAN"
+    if pa.types.is_integer(t):
+        return "INTEGER"
+    if pa.types.is_floating(t):
+        return "FLOAT"
+    if pa.types.is_decimal(t):
+        return "NUMERIC" if t.precision <= 38 and t.scale <= 9 else "BIGNUMERIC"
+    if pa.types.is_timestamp(t):
+        return "TIMESTAMP"
+    if pa.types.is_date(t):
+        return "DATE"
+    if pa.types.is_time(t):
+        return "TIME"
+    if pa.types.is_binary(t) or pa.types.is_large_binary(t):
+        return "BYTES"
+    return "STRING"
+
+
+def arrow_to_fields(schema: pa.Schema) -> Fields:
+    return [{"name": f.name, "type": arrow_to_bq_type(f.type), "mode": "NULLABLE"} for f in schema]
+
+
+def normalize_fields(spec: Union[Dict[str, str], Fields, List[bigquery.SchemaField]]) -> Fields:
+    """Contrato declarado -> Fields. Acepta {col: tipo}, [{"name","type"[,"mode"]}] o SchemaField."""
+    if isinstance(spec, dict):
+        return [{"name": n, "type": str(t).upper(), "mode": "NULLABLE"} for n, t in spec.items()]
+    out = []
+    for f in spec:
+        if isinstance(f, bigquery.SchemaField):
+            out.append({"name": f.name, "type": f.field_type, "mode": f.mode or "NULLABLE"})
+        else:
+            out.append({"name": f["name"], "type": str(f["type"]).upper(), "mode": f.get("mode", "NULLABLE")})
+    return out
+
+
+def to_schema_fields(fields: Fields) -> List[bigquery.SchemaField]:
+    return [bigquery.SchemaField(f["name"], f["type"], mode=f.get("mode", "NULLABLE")) for f in fields]
+
+
+def _canonical(t: str) -> str:
+    # BigQuery reporta alias legacy/estándar indistintamente
+    return {"INT64": "INTEGER", "FLOAT64": "FLOAT", "BOOL": "BOOLEAN"}.get(t.upper(), t.upper())
+
+
+def schema_diff(expected: Fields, incoming: Fields, *, check_types: bool = True) -> List[str]:
+    """Diferencias legibles (vacío = compatible). El orden de columnas no cuenta."""
+    exp = {f["name"].lower(): f for f in expected}
+    inc = {f["name"].lower(): f for f in incoming}
+    diff = [f"+ {inc[k]['name']} ({inc[k]['type']}): columna nueva" for k in inc if k not in exp]
+    diff += [f"- {exp[k]['name']} ({exp[k]['type']}): falta en el archivo" for k in exp if k not in inc]
+    if check_types:
+        diff += [
+            f"~ {exp[k]['name']}: {exp[k]['type']} -> {inc[k]['type']}"
+            for k in exp if k in inc and _canonical(exp[k]["type"]) != _canonical(inc[k]["type"])
+        ]
+    return diff
+
+
+def uri_list(gcs_uri: Union[str, Sequence[str]]) -> List[str]:
+    """Un URI, varios, o una lista serializada con comas -> lista sin vacíos ni repetidos."""
+    items = gcs_uri.split(",") if isinstance(gcs_uri, str) else list(gcs_uri)
+    return list(dict.fromkeys(u.strip() for u in items if u and u.strip()))
+
+
+def split_uri(gcs_uri: str) -> Tuple[str, str]:
+    if not gcs_uri.startswith("gs://"):
+        raise ValueError(f"Not a gs:// URI: {gcs_uri}")
+    bucket, _, name = gcs_uri[5:].partition("/")
+    return bucket, name
+
+
+def sample_blob(client: storage.Client, gcs_uri: str) -> Optional[storage.Blob]:
+    """Blob del URI; con comodín, el primero que matchea (todos deben compartir schema)."""
+    bucket, name = split_uri(gcs_uri)
+    if "*" not in name:
+        return client.bucket(bucket).get_blob(name)
+    prefix = name[:name.index("*")]
+    for blob in client.list_blobs(bucket, prefix=prefix):
+        if fnmatch.fnmatchcase(blob.name, name):
+            return blob
+    return None
+
+
+def matching_blobs(client: storage.Client, gcs_uri: str) -> List[storage.Blob]:
+    """Todos los blobs del URI (comodín expandido); vacío si no existe ninguno."""
+    bucket, name = split_uri(gcs_uri)
+    if "*" not in name:
+        blob = client.bucket(bucket).get_blob(name)
+        return [blob] if blob is not None else []
+    prefix = name[:name.index("*")]
+    return [b for b in client.list_blobs(bucket, prefix=prefix) if fnmatch.fnmatchcase(b.name, name)]
+
+
+def parquet_fields(blob: storage.Blob) -> Fields:
+    """Schema de un Parquet en GCS leyendo sólo el footer (1-2 range requests)."""
+    size = blob.size
+    tail = blob.download_as_bytes(start=max(0, size - _FOOTER_PROBE), end=size - 1)
+    if tail[-4:] != b"PAR1":
+        raise ValueError(f"gs://{blob.bucket.name}/{blob.name} is not a Parquet file")
+    footer_len = struct.unpack("<I", tail[-8:-4])[0]
+    if footer_len + 8 > len(tail):
+        tail = blob.download_as_bytes(start=size - footer_len - 8, end=size - 1)
+    footer = tail[-(footer_len + 8):]
+    return arrow_to_fields(pq.read_schema(pa.BufferReader(b"PAR1" + footer)))
+
+
+def csv_header(blob: storage.Blob, sep: str = ",", encoding: str = "utf-8") -> List[str]:
+    """Nombres de columnas de un CSV en GCS (sólo los primeros KB)."""
+    head = blob.download_as_bytes(start=0, end=min(blob.size, _CSV_PROBE) - 1)
+    text = head.decode(encoding if encoding.lower() not in ("utf-8", "utf8") else "utf-8-sig", errors="replace")
+    return next(csv.reader(io.StringIO(text), delimiter=sep), [])
+
+
+def local_fields(path: str, source_format: str = "PARQUET", sep: str = ",", encoding: str = "utf-8") -> Fields:
+    """Schema de un archivo local: footer del Parquet o header del CSV (columnas STRING)."""
+    if source_format == "PARQUET":
+        return arrow_to_fields(pq.read_schema(path))
+    enc = encoding if encoding.lower() not in ("utf-8", "utf8") else "utf-8-sig"
+    with open(path, "r", encoding=enc, errors="replace", newline="") as fh:
+        names = next(csv.reader(fh, delimiter=sep), [])
+    return [{"name": n, "type": "STRING", "mode": "NULLABLE"} for n in names]
@@ -0,0 +1,88 @@
+# /opt/airflow/plugins/utils/load_schema_cache.py
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+from datetime import datetime
+from typing import Optional
+
+LOAD_SCHEMA_CACHE = os.path.join(os.getenv("AIRFLOW_HOME", "/opt/airflow"), "data", "cache", "bq_load_schemas.sqlite")
+
+
+class LoadSchemaCache:
+    """
+    Schemas de carga por table_id en SQLite: una fila por tabla, así las tareas
+    mapeadas que cargan tablas distintas en paralelo sólo leen y reemplazan su
+    propia fila (con un JSON compartido la última en guardar pisaba al resto).
+
+    Si existe el cache JSON anterior (mismo nombre con .json) y la tabla está
+    vacía, sus entradas se importan una vez.
+
+    Uso:
+        with LoadSchemaCache(path) as cache:
+            entry = cache.get(table_id)
+            cache.put(table_id, "PARQUET", fields)
+    """
+
+    def __init__(self, path: str = LOAD_SCHEMA_CACHE):
+        self.path = path
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=300)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS load_schemas ("
+            " table_id TEXT PRIMARY KEY,"
+            " source_format TEXT NOT NULL,"
+            " fields TEXT NOT NULL,"
+            " updated_at TEXT NOT NULL"
+            ") WITHOUT ROWID"
+        )
+        self.conn.commit()
+        self._import_legacy_json(os.path.splitext(path)[0] + ".json")
+
+    def _import_legacy_json(self, legacy: str) -> None:
+        if legacy == self.path or not os.path.isfile(legacy):
+            return
+        if self.conn.execute("SELECT 1 FROM load_schemas LIMIT 1").fetchone():
+            return
+        try:
+            with open(legacy, "r", encoding="utf-8") as fh:
+                plans = json.load(fh).get("plans", {})
+        except (OSError, ValueError):
+            return
+        for table_id, entry in plans.items():
+            if entry.get("fields"):
+                self.conn.execute(
+                    "INSERT OR IGNORE INTO load_schemas(table_id, source_format, fields, updated_at) VALUES (?, ?, ?, ?)",
+                    (table_id, entry.get("source_format") or "PARQUET", json.dumps(entry["fields"]),
+                     datetime.now().strftime("%Y-%m-%d %H:%M:%S")),
+                )
+        self.conn.commit()
+
+    def get(self, table_id: str) -> Optional[dict]:
+        row = self.conn.execute(
+            "SELECT source_format, fields FROM load_schemas WHERE table_id = ?", (table_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {"source_format": row[0], "fields": json.loads(row[1])}
+
+    def put(self, table_id: str, source_format: str, fields: list) -> None:
+        """Registra (reemplaza) el schema de `table_id`; se confirma de inmediato."""
+        self.conn.execute(
+            "INSERT OR REPLACE INTO load_schemas(table_id, source_format, fields, updated_at) VALUES (?, ?, ?, ?)",
+            (table_id, source_format, json.dumps(fields), datetime.now().strftime("%Y-%m-%d %H:%M:%S")),
+        )
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "LoadSchemaCache":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,63 @@
+# /opt/airflow/plugins/utils/schema_plan.py
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+from typing import Any, Dict, Iterable, Optional
+
+
+class SchemaPlanCache:
+    """
+    Cache en disco (JSON) de planes de columnas: cabecera cruda -> nombres
+    canónicos + tipos. La clave es un hash de la fila de cabecera, así que
+    mientras el export no cambie de layout el plan se reutiliza tal cual.
+    """
+
+    VERSION = 1
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._plans: Dict[str, Dict[str, Any]] = {}
+        self._dirty = False
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as fh:
+                    data = json.load(fh)
+                if data.get("version") == self.VERSION:
+                    self._plans = data.get("plans", {})
+            except (OSError, ValueError):
+                # Cache corrupto o ilegible: se reconstruye
+                self._plans = {}
+
+    @classmethod
+    def header_key(cls, kind: str, columns: Iterable[Any], salt: str = "") -> str:
+        raw = "\x1f".join(str(c) for c in columns)
+        return hashlib.sha1(f"v{cls.VERSION}|{kind}|{salt}|{raw}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self._plans.get(key)
+
+    def put(self, key: str, plan: Dict[str, Any]) -> None:
+        self._plans[key] = plan
+        self._dirty = True
+
+    def __len__(self) -> int:
+        return len(self._plans)
+
+    def save(self) -> None:
+        """Escritura atómica (tmp + replace) para no romperlo con tareas mapeadas en paralelo."""
+        if not self.path or not self._dirty:
+            return
+        folder = os.path.dirname(self.path) or "."
+        os.makedirs(folder, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=".schema_plans_", dir=folder)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as fh:
+                json.dump({"version": self.VERSION, "plans": self._plans}, fh, ensure_ascii=False, indent=1)
+            os.replace(tmp, self.path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        self._dirty = False
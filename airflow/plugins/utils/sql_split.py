@@ -0,0 +1,155 @@
+# /opt/airflow/plugins/utils/sql_split.py
+from __future__ import annotations
+
+from typing import List, Tuple
+
+_BLOCK_END_SUFFIX = {"IF", "LOOP", "WHILE", "REPEAT", "FOR"}
+_RAW_PREFIXES = {"r", "rb", "br"}
+
+
+def _is_raw(sql: str, i: int) -> bool:
+    """True si la comilla en `i` abre un literal raw (r'…', rb'…', br'…', sin importar mayúsculas)."""
+    j = i
+    while j > 0 and (sql[j - 1].isalnum() or sql[j - 1] == "_"):
+        j -= 1
+    return sql[i] in "'\"" and sql[j:i].lower() in _RAW_PREFIXES
+
+
+def _skip_quoted(sql: str, i: int, raw: bool = False) -> int:
+    """
+    Índice justo después del literal/identificador que empieza en `i` (', ", `, ''' o \"\"\").
+    raw=True (r'…'): la barra invertida no escapa nada.
+    """
+    q = sql[i]
+    if q in "'\"" and sql.startswith(q * 3, i):
+        end = sql.find(q * 3, i + 3)
+        return len(sql) if end < 0 else end + 3
+    j = i + 1
+    while j < len(sql):
+        c = sql[j]
+        if c == "\\" and not raw:   # BigQuery usa escapes con barra invertida
+            j += 2
+            continue
+        if c == q:
+            return j + 1
+        j += 1
+    return len(sql)
+
+
+def _skip_comment(sql: str, i: int) -> int:
+    """Índice después del comentario en `i` (-- o # hasta fin de línea, /* */); i si no hay."""
+    if sql.startswith("--", i) or sql[i] == "#":
+        end = sql.find("\n", i)
+        return len(sql) if end < 0 else end + 1
+    if sql.startswith("/*", i):
+        end = sql.find("*/", i + 2)
+        return len(sql) if end < 0 else end + 2
+    return i
+
+
+def _next_token(sql: str, i: int) -> Tuple[str, int]:
+    """(palabra en mayúsculas o carácter, índice siguiente) desde `i`, saltando espacios y comentarios; "" al final."""
+    n = len(sql)
+    while i < n:
+        if sql[i].isspace():
+            i += 1
+            continue
+        j = _skip_comment(sql, i)
+        if j == i:
+            break
+        i = j
+    j = i
+    while j < n and (sql[j].isalnum() or sql[j] == "_"):
+        j += 1
+    if j > i:
+        return sql[i:j].upper(), j
+    return sql[i:i + 1], min(i + 1, n)
+
+
+def _has_code(stmt: str) -> bool:
+    i = 0
+    while i < len(stmt):
+        if stmt[i].isspace():
+            i += 1
+            continue
+        j = _skip_comment(stmt, i)
+        if j == i:
+            return True
+        i = j
+    return False
+
+
+def split_statements(sql: str) -> List[str]:
+    """
+    Parte un script SQL (dialecto BigQuery) en statements por `;` de nivel superior.
+    Ignora los `;` dentro de literales ('…', "…", '''…''', r'…'), identificadores
+    `…`, comentarios (--, #, /* */) y bloques BEGIN … END, CASE … END e
+    IF / LOOP / WHILE / REPEAT / FOR … END <X>. Los procedurales cuentan sólo al
+    comienzo de un statement (IF(…) como función o FOR SYSTEM_TIME no abren nada).
+    BEGIN; y BEGIN TRANSACTION son statements de transacción, no bloques.
+    Descarta statements vacíos o que sólo tienen comentarios.
+    """
+    statements: List[str] = []
+    blocks: List[str] = []   # bloques abiertos: BEGIN, CASE (expresión), CASE_STMT, IF, LOOP, ...
+    at_start = True          # el próximo token empieza un statement
+    start = 0
+    i = 0
+    n = len(sql)
+    while i < n:
+        c = sql[i]
+        if c.isspace():
+            i += 1
+            continue
+        if c in "'\"`":
+            i = _skip_quoted(sql, i, raw=_is_raw(sql, i))
+            at_start = False
+            continue
+        j = _skip_comment(sql, i)
+        if j != i:
+            i = j
+            continue
+        if c.isalpha() or c == "_":
+            j = i
+            while j < n and (sql[j].isalnum() or sql[j] == "_"):
+                j += 1
+            word = sql[i:j].upper()
+            was_start, at_start = at_start, False
+            if i and (sql[i - 1].isalnum() or sql[i - 1] in "_.`"):
+                i = j
+                continue
+            nxt, after = _next_token(sql, j)
+            if was_start and nxt == ":":
+                at_start, j = True, after            # etiqueta: `lbl: LOOP`
+            elif word == "BEGIN":
+                if nxt not in ("TRANSACTION", ";", ""):
+                    blocks.append("BEGIN")
+                    at_start = True
+            elif word == "CASE":
+                blocks.append("CASE_STMT" if was_start else "CASE")
+            elif was_start and word in _BLOCK_END_SUFFIX:
+                blocks.append(word)
+                at_start = word in ("LOOP", "REPEAT")
+            elif word == "END" and blocks:
+                blocks.pop()
+                if nxt in _BLOCK_END_SUFFIX or nxt == "CASE":
+                    j = after                        # END IF / END LOOP / END CASE ...
+            elif word in ("THEN", "ELSE") and blocks and blocks[-1] in ("IF", "CASE_STMT", "BEGIN"):
+                at_start = True
+            elif word == "DO" and blocks and blocks[-1] in ("WHILE", "FOR"):
+                at_start = True
+            i = j
+            continue
+        if c == ";":
+            at_start = True
+            if not blocks:
+                stmt = sql[start:i].strip()
+                if _has_code(stmt):
+                    statements.append(stmt)
+                start = i + 1
+        else:
+            at_start = False
+        i += 1
+    tail = sql[start:].strip()
+    if _has_code(tail):
+        statements.append(tail)
+    return statements
@@ -0,0 +1,549 @@
+# /opt/airflow/plugins/utils/tabular_io.py
+from __future__ import annotations
+
+import csv
+import os
+import re
+import sys
+from datetime import datetime
+from collections import defaultdict
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+
+from .checksums import HashingFile, remember
+
+CSV_ENGINES = ("pyarrow", "python")
+
+# Mismos marcadores de nulo que usa pd.read_csv por defecto
+NA_VALUES = [
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan",
+    "1.#IND", "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None",
+    "n/a", "nan", "null",
+]
+
+
+def _dedupe_names(names: List[str]) -> List[str]:
+    """Renombra columnas repetidas igual que pandas: 'x', 'x.1', 'x.2'..."""
+    seen: dict = {}
+    out = []
+    for n in names:
+        if n in seen:
+            seen[n] += 1
+            cand = f"{n}.{seen[n]}"
+            while cand in seen:
+                seen[n] += 1
+                cand = f"{n}.{seen[n]}"
+            seen[cand] = 0
+            out.append(cand)
+        else:
+            seen[n] = 0
+            out.append(n)
+    return out
+
+
+def read_header(path: str, header: int = 0, sep: str = ",", encoding: str = "utf-8") -> List[str]:
+    """Devuelve la fila de cabecera (saltando `header` filas previas)."""
+    enc = "utf-8-sig" if encoding.lower().replace("_", "-") in ("utf-8", "utf8") else encoding
+    with open(path, "r", encoding=enc, newline="") as fh:
+        reader = csv.reader(fh, delimiter=sep)
+        for i, row in enumerate(reader):
+            if i == header:
+                return _dedupe_names([c if c != "" else f"Unnamed: {j}" for j, c in enumerate(row)])
+    raise pd.errors.EmptyDataError(f"Sin cabecera en la fila {header}: {path}")
+
+
+def quarantine_path(quarantine_dir: str, src_path: str) -> str:
+    stem = os.path.splitext(os.path.basename(src_path))[0]
+    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return os.path.join(quarantine_dir, f"{stem}_{ts}.rejected.csv")
+
+
+def _write_quarantine(quarantine_dir: Optional[str], src_path: str, rows: List[str]) -> Optional[str]:
+    if not rows or not quarantine_dir:
+        return None
+    os.makedirs(quarantine_dir, exist_ok=True)
+    out = quarantine_path(quarantine_dir, src_path)
+    with open(out, "w", encoding="utf-8", newline="") as fh:
+        for line in rows:
+            fh.write(line.rstrip("\r\n") + "\n")
+    return out
+
+
+def _arrow_options(names: List[str], header: int, sep: str, encoding: str,
+                   block_size: Optional[int], rejected: List[str], short: List[str],
+                   dictionary_columns: Optional[Iterable[str]] = None):
+    def _on_invalid(row) -> str:
+        # como on_bad_lines='skip' de pandas: sólo sobran campos => cuarentena;
+        # si faltan, la fila se conserva (se completa con nulos en _short_rows_frame)
+        if row.actual_columns < row.expected_columns:
+            short.append(row.text)
+        else:
+            rejected.append(row.text)
+        return "skip"
+
+    read_opts = pacsv.ReadOptions(
+        column_names=names,
+        skip_rows=header + 1,
+        encoding=encoding,
+        use_threads=True,
+        **({"block_size": int(block_size)} if block_size else {}),
+    )
+    parse_opts = pacsv.ParseOptions(delimiter=sep, invalid_row_handler=_on_invalid)
+    dict_cols = set(dictionary_columns or ())
+    dict_type = pa.dictionary(pa.int32(), pa.string())
+    convert_opts = pacsv.ConvertOptions(
+        column_types={n: (dict_type if n in dict_cols else pa.string()) for n in names},
+        null_values=NA_VALUES,
+        strings_can_be_null=True,
+    )
+    return read_opts, parse_opts, convert_opts
+
+
+def _short_rows_frame(rows: List[str], names: List[str], sep: str,
+                      dictionary_columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """Filas con menos campos que la cabecera, completadas con NaN (como el engine python)."""
+    na = set(NA_VALUES)
+    records = []
+    for parsed in csv.reader(rows, delimiter=sep):
+        fields = [np.nan if f in na else f for f in parsed[:len(names)]]
+        records.append(fields + [np.nan] * (len(names) - len(fields)))
+    df = pd.DataFrame(records, columns=names, dtype=object)
+    for col in dictionary_columns or ():
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    return df
+
+
+def _python_on_bad(sep: str, rejected: List[str]):
+    def _on_bad(fields: List[str]):
+        rejected.append(sep.join("" if f is None else str(f) for f in fields))
+        return None  # None => se descarta la fila
+    return _on_bad
+
+
+def _arrow_to_pandas(table: pa.Table) -> pd.DataFrame:
+    # to_pandas deja None en nulos; pandas usa NaN (las dictionary ya llegan como category)
+    df = table.to_pandas()
+    obj_cols = [c for c, t in df.dtypes.items() if t == object]
+    if obj_cols:
+        df[obj_cols] = df[obj_cols].fillna(np.nan)
+    return df
+
+
+def _python_dtypes(dictionary_columns: Optional[Iterable[str]]):
+    dict_cols = list(dictionary_columns or ())
+    if not dict_cols:
+        return str
+    return defaultdict(lambda: str, {c: "category" for c in dict_cols})
+
+
+def read_csv(
+    path: str,
+    *,
+    header: int = 0,
+    engine: str = "pyarrow",
+    sep: str = ",",
+    encoding: str = "utf-8",
+    quarantine_dir: Optional[str] = None,
+    block_size: Optional[int] = None,
+    dictionary_columns: Optional[Iterable[str]] = None,
+) -> Tuple[pd.DataFrame, int, Optional[str]]:
+    """
+    Lee un CSV con todas las columnas como texto (equivalente a
+    pd.read_csv(dtype=str, on_bad_lines='skip')), pero guardando las filas
+    malformadas (con campos de más) en `quarantine_dir` en vez de perderlas.
+    Las filas con campos de menos se conservan completadas con NaN, igual que
+    en pandas (con pyarrow quedan al final del frame).
+    Devuelve (df, n_filas_descartadas, archivo_cuarentena | None).
+
+    - engine='pyarrow': parser multihilo de pyarrow.csv (por defecto).
+    - engine='python' : parser python de pandas (lento, fallback).
+    - dictionary_columns: columnas (nombre crudo) que se leen ya como category
+      (pyarrow dictionary), sin pasar por strings object.
+    """
+    if engine not in CSV_ENGINES:
+        raise ValueError(f"engine inválido: {engine!r}; usa uno de {CSV_ENGINES}")
+
+    rejected: List[str] = []
+    short: List[str] = []
+    if engine == "python":
+        df = pd.read_csv(
+            path, header=header, sep=sep, encoding=encoding,
+            dtype=_python_dtypes(dictionary_columns), engine="python",
+            on_bad_lines=_python_on_bad(sep, rejected),
+        )
+    else:
+        names = read_header(path, header=header, sep=sep, encoding=encoding)
+        read_opts, parse_opts, convert_opts = _arrow_options(
+            names, header, sep, encoding, block_size, rejected, short, dictionary_columns,
+        )
+        table = pacsv.read_csv(
+            path, read_options=read_opts, parse_options=parse_opts, convert_options=convert_opts,
+        )
+        df = _arrow_to_pandas(table)
+        if short:
+            df = concat_frames([df, _short_rows_frame(short, names, sep, dictionary_columns)])
+
+    qfile = _write_quarantine(quarantine_dir, path, rejected)
+    return df, len(rejected), qfile
+
+
+def iter_csv(
+    path: str,
+    *,
+    chunk_rows: int,
+    header: int = 0,
+    engine: str = "pyarrow",
+    sep: str = ",",
+    encoding: str = "utf-8",
+    quarantine_dir: Optional[str] = None,
+    stats: Optional[dict] = None,
+    dictionary_columns: Optional[Iterable[str]] = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Igual que read_csv pero en bloques de `chunk_rows` filas, sin cargar el
+    archivo completo. Al terminar, deja en `stats` las claves 'rejected' y
+    'quarantine_file'.
+    """
+    if engine not in CSV_ENGINES:
+        raise ValueError(f"engine inválido: {engine!r}; usa uno de {CSV_ENGINES}")
+    chunk_rows = int(chunk_rows)
+    if chunk_rows <= 0:
+        raise ValueError("chunk_rows debe ser > 0")
+
+    rejected: List[str] = []
+    short: List[str] = []
+    if engine == "python":
+        with pd.read_csv(
+            path, header=header, sep=sep, encoding=encoding, dtype=_python_dtypes(dictionary_columns),
+            engine="python", on_bad_lines=_python_on_bad(sep, rejected), chunksize=chunk_rows,
+        ) as reader:
+            for chunk in reader:
+                yield chunk.reset_index(drop=True)
+    else:
+        names = read_header(path, header=header, sep=sep, encoding=encoding)
+        read_opts, parse_opts, convert_opts = _arrow_options(
+            names, header, sep, encoding, None, rejected, short, dictionary_columns,
+        )
+        reader = pacsv.open_csv(
+            path, read_options=read_opts, parse_options=parse_opts, convert_options=convert_opts,
+        )
+        pending: List[pa.RecordBatch] = []
+        pending_rows = 0
+        for batch in reader:
+            pending.append(batch)
+            pending_rows += batch.num_rows
+            while pending_rows >= chunk_rows:
+                table = pa.Table.from_batches(pending)
+                yield _arrow_to_pandas(table.slice(0, chunk_rows))
+                rest = table.slice(chunk_rows)
+                pending = rest.to_batches()
+                pending_rows = rest.num_rows
+        if pending_rows:
+            yield _arrow_to_pandas(pa.Table.from_batches(pending))
+        if short:
+            # filas cortas: al final, en bloques de chunk_rows
+            extra = _short_rows_frame(short, names, sep, dictionary_columns)
+            for start in range(0, len(extra), chunk_rows):
+                yield extra.iloc[start:start + chunk_rows].reset_index(drop=True)
+
+    qfile = _write_quarantine(quarantine_dir, path, rejected)
+    if stats is not None:
+        stats["rejected"] = len(rejected)
+        stats["quarantine_file"] = qfile
+
+
+# ----------------------- memoria compacta -----------------------
+
+def concat_frames(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """
+    pd.concat que conserva las columnas category: unifica las categorías
+    antes de concatenar (si difieren, pandas las degrada a object).
+    """
+    frames = list(frames)
+    if len(frames) > 1:
+        common = set(frames[0].columns).intersection(*(f.columns for f in frames[1:]))
+        for col in common:
+            if all(isinstance(f[col].dtype, pd.CategoricalDtype) for f in frames):
+                cats = pd.api.types.union_categoricals([f[col] for f in frames]).categories
+                for f in frames:
+                    f[col] = f[col].cat.set_categories(cats)
+    return pd.concat(frames, ignore_index=True)
+
+
+def memory_report(df: pd.DataFrame) -> Tuple[int, int]:
+    """
+    (bytes reales, bytes estimados si las category fueran strings object).
+    La estimación no materializa las columnas: usa conteos por categoría.
+    """
+    actual = int(df.memory_usage(deep=True, index=False).sum())
+    as_object = actual
+    nan_size = sys.getsizeof(np.nan)
+    for col, dtype in df.dtypes.items():
+        if not isinstance(dtype, pd.CategoricalDtype):
+            continue
+        ser = df[col]
+        counts = ser.value_counts(sort=False, dropna=False)
+        obj = 8 * len(ser)  # punteros del array object
+        for cat, n in counts.items():
+            obj += (nan_size if pd.isna(cat) else sys.getsizeof(cat)) * int(n)
+        as_object += obj - int(ser.memory_usage(deep=True, index=False))
+    return actual, as_object
+
+
+# ----------------------- escritura -----------------------
+
+OUTPUT_FORMATS = ("csv", "parquet")
+
+
+def arrow_schema(df: pd.DataFrame) -> pa.Schema:
+    """
+    Schema explícito para escribir `df` a Parquet: enteros nullable (Int64)
+    como int64, flotantes/bool como tales, categóricas como dictionary y todo
+    lo demás como string (nunca se infiere desde el contenido).
+    """
+    fields = []
+    for name, dtype in df.dtypes.items():
+        if isinstance(dtype, pd.CategoricalDtype):
+            typ = pa.dictionary(pa.int32(), pa.string())
+        elif pd.api.types.is_bool_dtype(dtype):
+            typ = pa.bool_()
+        elif pd.api.types.is_integer_dtype(dtype):
+            typ = pa.int64()
+        elif pd.api.types.is_float_dtype(dtype):
+            typ = pa.float64()
+        else:
+            typ = pa.string()
+        fields.append(pa.field(str(name), typ, nullable=True))
+    return pa.schema(fields)
+
+
+class CSVFrameWriter:
+    """Escribe uno o varios bloques de DataFrame al mismo CSV (cabecera una vez)."""
+
+    def __init__(self, path: str, encoding: str = "utf-8"):
+        self.path = path
+        self.encoding = encoding
+        self._started = False
+
+    def write(self, df: pd.DataFrame) -> None:
+        df.to_csv(self.path, mode="a" if self._started else "w", header=not self._started,
+                  index=False, encoding=self.encoding)
+        self._started = True
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> "CSVFrameWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ParquetFrameWriter:
+    """
+    Escribe uno o varios bloques de DataFrame a un Parquet tipado y con
+    dictionary encoding. El schema sale del primer bloque (o se pasa
+    explícito) y los bloques siguientes se convierten a ese mismo schema.
+
+    Los bytes pasan por un HashingFile: al cerrar quedan en `digests` el
+    MD5/CRC32C del archivo (y en el cache de checksums, para el upload a GCS).
+    """
+
+    def __init__(self, path: str, schema: Optional[pa.Schema] = None, compression: str = "snappy"):
+        self.path = path
+        self.schema = schema
+        self.compression = compression
+        self.digests: Optional[dict] = None
+        self._sink: Optional[HashingFile] = None
+        self._writer: Optional[pq.ParquetWriter] = None
+
+    def write(self, df: pd.DataFrame) -> None:
+        if self._writer is None:
+            if self.schema is None:
+                self.schema = arrow_schema(df)
+            self._sink = HashingFile(self.path)
+            self._writer = pq.ParquetWriter(
+                self._sink, self.schema, compression=self.compression, use_dictionary=True,
+            )
+        table = pa.Table.from_pandas(df, schema=self.schema, preserve_index=False)
+        self._writer.write_table(table)
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._sink is not None:
+            self._sink.close()
+            self.digests = self._sink.digests()
+            self._sink = None
+            remember(self.path, self.digests)
+
+    def __enter__(self) -> "ParquetFrameWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def frame_writer(path: str, output_format: str = "csv"):
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"output_format inválido: {output_format!r}; usa uno de {OUTPUT_FORMATS}")
+    if output_format == "parquet":
+        return ParquetFrameWriter(path)
+    return CSVFrameWriter(path)
+
+
+def is_parquet(path: str) -> bool:
+    """Detecta Parquet por los bytes mágicos 'PAR1' (no por la extensión)."""
+    try:
+        with open(path, "rb") as fh:
+            return fh.read(4) == b"PAR1"
+    except OSError:
+        return False
+
+
+# ----------------------- CSV -> Parquet en streaming -----------------------
+
+_TYPE_ALIASES = {"str": "string", "object": "string", "text": "string", "int": "int64",
+                 "integer": "int64", "float": "float64", "boolean": "bool"}
+
+
+def arrow_type(spec) -> pa.DataType:
+    """'string' | 'int64' | 'float64' | 'bool' | 'date32' | 'timestamp[s]' ... (o un pa.DataType)."""
+    if isinstance(spec, pa.DataType):
+        return spec
+    s = str(spec).strip()
+    return pa.type_for_alias(_TYPE_ALIASES.get(s.lower(), s.lower()))
+
+
+def csv_to_parquet(
+    src_path: str,
+    dst_path: str,
+    *,
+    sep: str = ",",
+    encoding: str = "utf-8",
+    dtypes: Optional[dict] = None,
+    header: int = 0,
+    row_group_size: int = 128_000,
+    compression: str = "snappy",
+    block_size: int = 8 << 20,
+    stats: Optional[dict] = None,
+) -> int:
+    """
+    Convierte CSV -> Parquet sin cargar el archivo completo: lector Arrow
+    incremental + ParquetWriter, un row group cada `row_group_size` filas.
+    La memoria pico queda acotada a un row group.
+
+    Los tipos se infieren del primer bloque salvo los de `dtypes`
+    ({columna: tipo}), con las mismas salidas que pd.read_csv: fechas, horas
+    y timestamps no declarados quedan como string (los SAFE.PARSE_* de dbt
+    esperan texto). Si un bloque posterior no encaja, se ensancha sólo la
+    columna que falló (int -> float64, si no -> string) y se reintenta.
+    Devuelve la cantidad de filas escritas; si se pasa `stats`, deja ahí
+    'md5' y 'crc32c' del Parquet (calculados mientras se escribe).
+    """
+    names = read_header(src_path, header=header, sep=sep, encoding=encoding)
+    declared = {c: arrow_type(t) for c, t in (dtypes or {}).items()}
+    column_types = _infer_types(src_path, names, declared, sep, encoding, header, block_size)
+    while True:
+        try:
+            return _csv_to_parquet(src_path, dst_path, names, column_types, sep, encoding, header,
+                                   row_group_size, compression, block_size, stats)
+        except pa.ArrowInvalid as exc:
+            widened = _widen(column_types, names, declared, exc)
+            if widened is None:
+                raise
+            column_types = widened
+
+
+def _is_temporal(t: pa.DataType) -> bool:
+    return pa.types.is_timestamp(t) or pa.types.is_date(t) or pa.types.is_time(t)
+
+
+def _infer_types(src_path, names, declared, sep, encoding, header, block_size) -> dict:
+    """Tipos del primer bloque (inferencia de Arrow) + declarados; temporales no declarados -> string."""
+    read_opts = pacsv.ReadOptions(
+        column_names=names, skip_rows=header + 1, encoding=encoding,
+        use_threads=True, block_size=int(block_size),
+    )
+    reader = pacsv.open_csv(
+        src_path, read_options=read_opts, parse_options=pacsv.ParseOptions(delimiter=sep),
+        convert_options=pacsv.ConvertOptions(column_types=declared, null_values=NA_VALUES,
+                                             strings_can_be_null=True),
+    )
+    try:
+        schema = reader.schema
+    finally:
+        reader.close()
+    types = {}
+    for field in schema:
+        if field.name in declared:
+            types[field.name] = declared[field.name]
+        elif _is_temporal(field.type) or pa.types.is_null(field.type):
+            types[field.name] = pa.string()
+        else:
+            types[field.name] = field.type
+    return types
+
+
+_CSV_COLUMN_ERROR = re.compile(r"CSV column #(\d+)")
+
+
+def _widen(column_types: dict, names: List[str], declared: dict, exc: Exception) -> Optional[dict]:
+    """Copia de column_types con la columna del error ensanchada; None si no hay qué ensanchar."""
+    match = _CSV_COLUMN_ERROR.search(str(exc))
+    if not match or int(match.group(1)) >= len(names):
+        return None
+    name = names[int(match.group(1))]
+    current = column_types.get(name)
+    if name in declared or current is None:
+        return None
+    if pa.types.is_integer(current):
+        wider = pa.float64()
+    elif not pa.types.is_string(current):
+        wider = pa.string()
+    else:
+        return None
+    return {**column_types, name: wider}
+
+
+def _csv_to_parquet(src_path, dst_path, names, column_types, sep, encoding, header,
+                    row_group_size, compression, block_size, stats=None) -> int:
+    read_opts = pacsv.ReadOptions(
+        column_names=names, skip_rows=header + 1, encoding=encoding,
+        use_threads=True, block_size=int(block_size),
+    )
+    parse_opts = pacsv.ParseOptions(delimiter=sep)
+    convert_opts = pacsv.ConvertOptions(
+        column_types=column_types, null_values=NA_VALUES, strings_can_be_null=True,
+    )
+    reader = pacsv.open_csv(src_path, read_options=read_opts, parse_options=parse_opts,
+                            convert_options=convert_opts)
+    row_group_size = int(row_group_size)
+    rows = 0
+    with HashingFile(dst_path) as sink, \
+            pq.ParquetWriter(sink, reader.schema, compression=compression, use_dictionary=True) as writer:
+        pending: List[pa.RecordBatch] = []
+        pending_rows = 0
+        for batch in reader:
+            pending.append(batch)
+            pending_rows += batch.num_rows
+            while pending_rows >= row_group_size:
+                table = pa.Table.from_batches(pending, schema=reader.schema)
+                writer.write_table(table.slice(0, row_group_size), row_group_size=row_group_size)
+                rest = table.slice(row_group_size)
+                pending, pending_rows = rest.to_batches(), rest.num_rows
+                rows += row_group_size
+        if pending_rows:
+            writer.write_table(pa.Table.from_batches(pending, schema=reader.schema), row_group_size=row_group_size)
+            rows += pending_rows
+    if stats is not None:
+        stats.update(sink.digests())
+    return rows
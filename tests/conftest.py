@@ -0,0 +1,32 @@
+# tests/conftest.py
+import os
+import socket
+import sys
+
+import pytest
+
+# los módulos del repo se importan como en Airflow: `from utils.X import ...`
+# (los tests viven fuera de plugins/ para que el plugin loader no los importe)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "airflow", "plugins"))
+
+
+@pytest.fixture
+def gcs_bucket(monkeypatch):
+    """Bucket `bkt` en gcp-storage-emulator, con el cliente inyectado en el registro de gcp_clients."""
+    emulator = pytest.importorskip("gcp_storage_emulator.server")
+    from google.auth.credentials import AnonymousCredentials
+    from google.cloud import storage
+    from utils import gcp_clients
+
+    with socket.socket() as s:
+        s.bind(("localhost", 0))
+        port = s.getsockname()[1]
+    server = emulator.create_server("localhost", port, in_memory=True, default_bucket="bkt")
+    server.start()
+    try:
+        monkeypatch.setenv("STORAGE_EMULATOR_HOST", f"http://localhost:{port}")
+        client = storage.Client(project="test", credentials=AnonymousCredentials())
+        monkeypatch.setitem(gcp_clients._clients, gcp_clients._key("storage", None, None), client)
+        yield client.bucket("bkt")
+    finally:
+        server.stop()
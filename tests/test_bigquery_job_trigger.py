@@ -0,0 +1,69 @@
+# tests/test_bigquery_job_trigger.py
+import asyncio
+import importlib
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+
+pytest.importorskip("airflow.triggers.base")
+
+from google.api_core.exceptions import NotFound, ServiceUnavailable
+
+from triggers import bigquery_job_trigger
+from triggers.bigquery_job_trigger import BigQueryJobTrigger
+
+
+def _job(state, error_result=None):
+    return SimpleNamespace(state=state, error_result=error_result, job_type="query")
+
+
+def _events(trigger, *responses):
+    client = mock.Mock()
+    client.get_job.side_effect = list(responses)
+
+    async def collect():
+        return [event async for event in trigger.run()]
+
+    with mock.patch.object(bigquery_job_trigger, "bigquery_client", return_value=client):
+        events = asyncio.run(collect())
+    assert len(events) == 1
+    return events[0].payload, client.get_job.call_count
+
+
+def test_job_that_completes():
+    trigger = BigQueryJobTrigger("job_1", project="p", location="US", poll_interval=0)
+    payload, polls = _events(trigger, _job("RUNNING"), _job("DONE"))
+    assert payload == {"job_id": "job_1", "location": "US", "status": "success", "job_type": "query", "state": "DONE"}
+    assert polls == 2
+
+
+def test_job_that_fails():
+    trigger = BigQueryJobTrigger("job_1", poll_interval=0)
+    payload, _ = _events(trigger, _job("DONE", {"reason": "invalidQuery", "message": "Syntax error"}))
+    assert payload["status"] == "error" and payload["message"] == "Syntax error"
+
+
+def test_transient_poll_error_is_retried():
+    trigger = BigQueryJobTrigger("job_1", poll_interval=0, max_poll_errors=3)
+    payload, polls = _events(trigger, ServiceUnavailable("503"), ServiceUnavailable("503"), _job("DONE"))
+    assert payload["status"] == "success" and polls == 3
+
+
+def test_poll_errors_give_up():
+    payload, polls = _events(BigQueryJobTrigger("job_1", poll_interval=0), NotFound("gone"))
+    assert payload["status"] == "error" and "NotFound" in payload["message"] and polls == 1
+
+    trigger = BigQueryJobTrigger("job_1", poll_interval=0, max_poll_errors=2)
+    payload, polls = _events(trigger, ServiceUnavailable("503"), ServiceUnavailable("503"))
+    assert payload["status"] == "error" and polls == 2
+
+
+def test_serialize_round_trip():
+    trigger = BigQueryJobTrigger("job_1", project="p", location="EU", credentials="/k.json",
+                                 poll_interval=2.5, max_poll_errors=7)
+    classpath, kwargs = trigger.serialize()
+    module, name = classpath.rsplit(".", 1)
+    rebuilt = getattr(importlib.import_module(module), name)(**kwargs)
+    assert type(rebuilt) is BigQueryJobTrigger
+    assert rebuilt.serialize() == (classpath, kwargs)
@@ -0,0 +1,43 @@
+# tests/test_bq_telemetry.py
+from unittest import mock
+
+from google.cloud import bigquery
+
+from utils.bq_telemetry import job_stats, summary
+
+
+def _job(cls, kind, config, statistics):
+    resource = {
+        "jobReference": {"projectId": "p", "jobId": f"{kind}_1", "location": "US"},
+        "configuration": {kind: config},
+        "statistics": dict({"creationTime": "1700000000000", "startTime": "1700000001500",
+                            "endTime": "1700000004000"}, **statistics),
+        "status": {"state": "DONE"},
+    }
+    return cls.from_api_repr(resource, mock.Mock(project="p"))
+
+
+def test_query_job_stats():
+    job = _job(bigquery.QueryJob, "query", {"query": "UPDATE t SET a = 1 WHERE TRUE"}, {
+        "totalSlotMs": "900",
+        "query": {"totalBytesProcessed": "2097152", "totalBytesBilled": "10485760", "totalSlotMs": "900",
+                  "cacheHit": False, "statementType": "UPDATE", "numDmlAffectedRows": "0"},
+    })
+    stats = job_stats(job, "upd")
+    assert stats["job_type"] == "query" and stats["statement_type"] == "UPDATE"
+    assert (stats["bytes_processed"], stats["bytes_billed"], stats["slot_ms"]) == (2097152, 10485760, 900)
+    assert (stats["queue_s"], stats["exec_s"]) == (1.5, 2.5)
+    assert stats["cache_hit"] is False and stats["output_rows"] == 0
+    assert "procesado 2.0 MiB" in summary(stats)
+
+
+def test_load_and_copy_row_counts():
+    load = _job(bigquery.LoadJob, "load", {"destinationTable": {"projectId": "p", "datasetId": "d", "tableId": "t"}},
+                {"totalSlotMs": "40", "load": {"outputRows": "0", "inputFileBytes": "123"}})
+    stats = job_stats(load)
+    assert (stats["output_rows"], stats["input_bytes"], stats["slot_ms"]) == (0, 123, 40)
+    assert stats["bytes_processed"] is None and "procesado -" in summary(stats)
+
+    copy = _job(bigquery.CopyJob, "copy", {"destinationTable": {"projectId": "p", "datasetId": "d", "tableId": "t"}},
+                {"copy": {"copiedRows": "7"}})
+    assert job_stats(copy)["output_rows"] == 7
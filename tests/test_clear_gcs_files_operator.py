@@ -0,0 +1,33 @@
+# tests/test_clear_gcs_files_operator.py
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+
+pytest.importorskip("airflow.models")
+
+from google.cloud.storage.batch import Batch
+
+from operators.clear_gcs_files_operator import ClearGCSFilesOperator
+
+
+def _op(**kwargs):
+    return ClearGCSFilesOperator(task_id="clear", credentials=None, bucket="bkt", folder="raw", **kwargs)
+
+
+@pytest.mark.parametrize("mode", ["batch", "concurrent"])
+def test_deletes_in_batches_and_counts_missing(gcs_bucket, mode):
+    for i in range(150):
+        gcs_bucket.blob(f"raw/RAW_{i}.parquet").upload_from_string(b"x")
+    gcs_bucket.blob("raw/keep.csv").upload_from_string(b"x")
+
+    assert _op(files=["RAW_1*.parquet", "missing.csv", "RAW_0.parquet"], mode=mode).execute({}) == 62
+    assert _op(files=[], prefixes=["RAW_"], mode=mode).execute({}) == 88
+    assert [b.name for b in gcs_bucket.client.list_blobs("bkt")] == ["raw/keep.csv"]
+
+
+def test_other_errors_fail_the_task(gcs_bucket):
+    statuses = [SimpleNamespace(status_code=c) for c in (204, 404, 403)]
+    with mock.patch.object(Batch, "finish", return_value=statuses):
+        with pytest.raises(RuntimeError, match=r"raw/c \(403\)"):
+            _op(files=["a", "b", "c"]).execute({})
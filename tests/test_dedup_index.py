@@ -0,0 +1,41 @@
+# tests/test_dedup_index.py
+import sqlite3
+
+import pandas as pd
+
+from utils.dedup_index import UniqueIdIndex
+
+
+def _seen(path, run_key, ids):
+    with UniqueIdIndex(path, run_key) as idx:
+        return idx.seen_mask(pd.Series(ids)).tolist()
+
+
+def _emit(path, run_key, ids):
+    with UniqueIdIndex(path, run_key) as idx:
+        idx.add(pd.Series(ids))
+
+
+def test_ids_count_as_seen_only_after_commit(tmp_path):
+    path = str(tmp_path / "idx.sqlite")
+    _emit(path, "run_1", ["a", "b"])
+    # la carga de run_1 falló: run_2 vuelve a emitir a y b
+    assert _seen(path, "run_2", ["a", "b", "c"]) == [False, False, False]
+    _emit(path, "run_2", ["a", "b", "c"])
+    assert UniqueIdIndex.commit_run(path, "run_1") == 0
+    assert UniqueIdIndex.commit_run(path, "run_2") == 3
+
+    assert _seen(path, "run_3", ["a", "c", "d"]) == [True, True, False]
+    # un retry de la corrida que los emitió produce la misma salida
+    assert _seen(path, "run_2", ["a", "c"]) == [False, False]
+
+
+def test_legacy_rows_are_committed(tmp_path):
+    path = str(tmp_path / "idx.sqlite")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE seen_uniqueid (uniqueid TEXT PRIMARY KEY, run_key TEXT NOT NULL,"
+                 " first_seen TEXT NOT NULL) WITHOUT ROWID")
+    conn.execute("INSERT INTO seen_uniqueid VALUES ('a', 'old', '2099-01-01')")
+    conn.commit()
+    conn.close()
+    assert _seen(path, "run_1", ["a", "b"]) == [True, False]
@@ -0,0 +1,27 @@
+# tests/test_gcs_service.py
+from datetime import datetime
+from unittest import mock
+
+from utils.gcs_service import GCSService
+
+
+def test_upload_once_copy_backup_and_skip_unchanged(gcs_bucket, tmp_path):
+    bucket = gcs_bucket
+    (tmp_path / "ventas_2024.csv").write_text("id,monto\n1,10.5\n2,20\n", encoding="utf-8")
+    service = GCSService("bkt")
+    backup = f"backup/ventas_{datetime.now():%Y-%m-%d}.parquet"
+
+    with mock.patch.object(service, "_upload_file", wraps=service._upload_file) as upload, \
+         mock.patch.object(GCSService, "_server_side_copy", wraps=GCSService._server_side_copy) as copy:
+        service.upload_raw_and_backup(str(tmp_path), "ventas", "ventas")
+        assert [c.args[0].name for c in upload.call_args_list] == ["raw/RAW_ventas.parquet"]
+        assert copy.call_count == 1
+        assert service.last_result["raw_skipped"] is False and service.last_result["backup_skipped"] is False
+
+        raw, bkp = bucket.get_blob("raw/RAW_ventas.parquet"), bucket.get_blob(backup)
+        assert bkp is not None and bkp.md5_hash == raw.md5_hash == service.last_result["md5"]
+
+        service.upload_raw_and_backup(str(tmp_path), "ventas", "ventas")
+        assert upload.call_count == 1 and copy.call_count == 1
+        assert service.last_result["raw_skipped"] is True and service.last_result["backup_skipped"] is True
+        assert bucket.get_blob("raw/RAW_ventas.parquet").generation == raw.generation
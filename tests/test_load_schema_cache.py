@@ -0,0 +1,38 @@
+# tests/test_load_schema_cache.py
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.load_schema_cache import LoadSchemaCache
+
+
+def _fields(name):
+    return [{"name": name, "type": "STRING", "mode": "NULLABLE"}]
+
+
+def test_parallel_writers_keep_every_table(tmp_path):
+    path = str(tmp_path / "bq_load_schemas.sqlite")
+    LoadSchemaCache(path).close()
+
+    def write(i):
+        with LoadSchemaCache(path) as cache:
+            cache.put(f"p.d.t{i}", "PARQUET", _fields(f"c{i}"))
+
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(write, range(32)))
+
+    with LoadSchemaCache(path) as cache:
+        for i in range(32):
+            assert cache.get(f"p.d.t{i}") == {"source_format": "PARQUET", "fields": _fields(f"c{i}")}
+
+
+def test_imports_legacy_json_once(tmp_path):
+    legacy = tmp_path / "bq_load_schemas.json"
+    legacy.write_text(json.dumps({"version": 1, "plans": {"p.d.old": {"source_format": "CSV", "fields": _fields("a")}}}))
+    path = str(tmp_path / "bq_load_schemas.sqlite")
+
+    with LoadSchemaCache(path) as cache:
+        assert cache.get("p.d.old") == {"source_format": "CSV", "fields": _fields("a")}
+        cache.put("p.d.old", "CSV", _fields("b"))
+    with LoadSchemaCache(path) as cache:
+        assert cache.get("p.d.old")["fields"] == _fields("b")
+        assert cache.get("p.d.missing") is None
@@ -0,0 +1,70 @@
+# tests/test_sql_split.py
+from utils.sql_split import split_statements
+
+
+def test_plain_statements_and_literals():
+    sql = "SELECT 'a;b'; -- fin; \n SELECT `x;y` FROM t; /* ; */"
+    assert split_statements(sql) == ["SELECT 'a;b'", "-- fin; \n SELECT `x;y` FROM t"]
+
+
+def test_raw_string_backslash_is_not_an_escape():
+    assert split_statements(r"SELECT r'a\'; SELECT 1") == [r"SELECT r'a\'", "SELECT 1"]
+
+
+def test_begin_end_block_is_one_statement():
+    sql = "BEGIN\n  SELECT 1;\n  SELECT CASE WHEN x THEN 1 END;\nEND;\nSELECT 2;"
+    assert split_statements(sql) == ["BEGIN\n  SELECT 1;\n  SELECT CASE WHEN x THEN 1 END;\nEND", "SELECT 2"]
+
+
+def test_top_level_if_block():
+    sql = (
+        "DECLARE n INT64 DEFAULT 1;\n"
+        "IF n > 0 THEN\n"
+        "  DELETE FROM t WHERE true;\n"
+        "  IF n > 1 THEN SELECT IF(n > 2, 'a', 'b'); END IF;\n"
+        "ELSE\n"
+        "  SELECT 0;\n"
+        "END IF;\n"
+        "DROP TABLE IF EXISTS t2;"
+    )
+    assert split_statements(sql) == [
+        "DECLARE n INT64 DEFAULT 1",
+        "IF n > 0 THEN\n  DELETE FROM t WHERE true;\n  IF n > 1 THEN SELECT IF(n > 2, 'a', 'b'); END IF;\n"
+        "ELSE\n  SELECT 0;\nEND IF",
+        "DROP TABLE IF EXISTS t2",
+    ]
+
+
+def test_loops():
+    sql = (
+        "WHILE i < 3 DO SET i = i + 1; END WHILE;\n"
+        "lbl: LOOP SET i = i - 1; IF i = 0 THEN LEAVE lbl; END IF; END LOOP lbl;\n"
+        "REPEAT SET i = i + 1; UNTIL i > 3 END REPEAT;\n"
+        "FOR r IN (SELECT 1 AS x) DO SELECT r.x; END FOR;\n"
+        "SELECT * FROM t FOR SYSTEM_TIME AS OF CURRENT_TIMESTAMP();"
+    )
+    assert split_statements(sql) == [
+        "WHILE i < 3 DO SET i = i + 1; END WHILE",
+        "lbl: LOOP SET i = i - 1; IF i = 0 THEN LEAVE lbl; END IF; END LOOP lbl",
+        "REPEAT SET i = i + 1; UNTIL i > 3 END REPEAT",
+        "FOR r IN (SELECT 1 AS x) DO SELECT r.x; END FOR",
+        "SELECT * FROM t FOR SYSTEM_TIME AS OF CURRENT_TIMESTAMP()",
+    ]
+
+
+def test_short_transaction_form():
+    sql = "BEGIN;\nDELETE FROM t WHERE d = '2024-01-01';\nINSERT INTO t SELECT * FROM s;\nCOMMIT;"
+    assert split_statements(sql) == [
+        "BEGIN",
+        "DELETE FROM t WHERE d = '2024-01-01'",
+        "INSERT INTO t SELECT * FROM s",
+        "COMMIT",
+    ]
+    assert split_statements("BEGIN TRANSACTION; SELECT 1; COMMIT TRANSACTION;") == [
+        "BEGIN TRANSACTION", "SELECT 1", "COMMIT TRANSACTION",
+    ]
+
+
+def test_procedural_case_statement():
+    sql = "CASE x WHEN 1 THEN SELECT 1; ELSE SELECT 2; END CASE; SELECT 3"
+    assert split_statements(sql) == ["CASE x WHEN 1 THEN SELECT 1; ELSE SELECT 2; END CASE", "SELECT 3"]
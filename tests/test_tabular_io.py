@@ -0,0 +1,67 @@
+# tests/test_tabular_io.py
+import pandas as pd
+import pytest
+
+from utils import tabular_io
+
+CSV = (
+    "uniqueid,agent,note\n"
+    "1,A,x\n"
+    "2,B\n"              # campos de menos: se conserva con NaN
+    "3,C,y,extra\n"      # campos de más: cuarentena
+    "4,D,NULL\n"
+    '"5",E,"q,r"\n'
+)
+
+
+def _rows(df: pd.DataFrame) -> list:
+    df = df.astype(object).where(df.notna(), None)
+    return sorted(df.values.tolist(), key=lambda r: r[0])
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / "calls.csv"
+    path.write_text(CSV, encoding="utf-8")
+    return str(path)
+
+
+def test_engines_keep_the_same_rows(csv_path, tmp_path):
+    out = {}
+    for engine in tabular_io.CSV_ENGINES:
+        df, rejected, qfile = tabular_io.read_csv(
+            csv_path, engine=engine, quarantine_dir=str(tmp_path / engine), dictionary_columns=["agent"],
+        )
+        out[engine] = _rows(df)
+        assert rejected == 1
+        with open(qfile, encoding="utf-8") as fh:
+            assert fh.read().strip() == "3,C,y,extra"
+    assert out["pyarrow"] == out["python"]
+    assert ["2", "B", None] in out["pyarrow"]
+
+
+def test_iter_csv_engines_keep_the_same_rows(csv_path):
+    out = {}
+    for engine in tabular_io.CSV_ENGINES:
+        stats = {}
+        chunks = list(tabular_io.iter_csv(csv_path, chunk_rows=2, engine=engine, stats=stats))
+        out[engine] = _rows(pd.concat(chunks, ignore_index=True))
+        assert stats["rejected"] == 1
+    assert out["pyarrow"] == out["python"]
+    assert len(out["pyarrow"]) == 4
+
+
+def test_csv_to_parquet_types_match_pandas(tmp_path):
+    src = tmp_path / "amounts.csv"
+    body = "".join(f"{i},{i},2024-01-{i % 28 + 1:02d}\n" for i in range(3000))
+    src.write_text("id,amt,when\n" + body + "5,1.5,2024-01-02\n", encoding="utf-8")
+    dst = tmp_path / "amounts.parquet"
+
+    # bloques chicos: el 1.5 aparece después de inferir int en el primer bloque
+    rows = tabular_io.csv_to_parquet(str(src), str(dst), block_size=4096)
+
+    assert rows == 3001
+    schema = tabular_io.pq.read_schema(str(dst))
+    types = {f.name: str(f.type) for f in schema}
+    assert types == {"id": "int64", "amt": "double", "when": "string"}
+    assert pd.read_csv(src).dtypes.astype(str).to_dict() == {"id": "int64", "amt": "float64", "when": "object"}